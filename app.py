@@ -1,8 +1,11 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import mysql.connector
 from mysql.connector import pooling
 import json
 import shutil
+import threading
+import time
 import requests  # 添加缺失的导入
 from pathlib import Path
 from datetime import datetime
@@ -10,11 +13,55 @@ import os
 import redis
 import logging
 
+from scripts.account_groups import AccountGroupTable, GroupStageSync, group_stage
+from scripts.account_scanner import parse_group_prefix
+from scripts.account_watcher import AccountWatcher
+from scripts.channel_snapshot import ChannelSnapshotStore
+from scripts.db_pool import InstrumentedPool
+from scripts import fast_json
+from scripts.dependency_health import DependencyHealth
+from scripts.key_material import parse_key_material
+from scripts.metrics import MetricsWriter
+from scripts.models import ChannelState
+from scripts.new_api_client import NewAPIError, get_shared_client
+from scripts.pool_index import AccountPoolIndex
+from scripts.response_cache import ResponseCache
+from scripts.update_broadcaster import UpdateBroadcaster
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 依赖账号目录的缓存，文件变化时清除
+POOL_CACHES = ('stats', 'account_pools')
+
+# 待激活页面：排序方式和每页数量
+PENDING_SORTS = ('quota_desc', 'quota_asc', 'prefix')
+PENDING_PAGE_SIZES = (20, 50, 100, 200)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """接口JSON使用 scripts.fast_json 序列化（账号组、渠道等记录类型按 to_json() 输出）"""
+    
+    @staticmethod
+    def default(o):
+        to_json = getattr(o, 'to_json', None)
+        if to_json is not None:
+            return to_json()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        # 调试模式的缩进输出仍使用标准库
+        if 'indent' in kwargs:
+            return super().dumps(obj, **kwargs)
+        return fast_json.dumps(obj, default=DefaultJSONProvider.default)
+    
+    def loads(self, s, **kwargs):
+        return fast_json.loads(s)
+
+
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 
 class PanelManager:
@@ -24,8 +71,29 @@ class PanelManager:
         """初始化面板管理器"""
         self.base_dir = Path("accounts")
         self.load_config()
+        self.api_client = get_shared_client(self.config.get('new_api', {}))
+        # 数据库和Redis都在首次使用时连接，不可用时由后台线程重连，不阻塞启动
+        self.health = DependencyHealth()
         self.init_database_pool()
         self.init_redis()
+        self.init_cache()
+        self.snapshot_store = ChannelSnapshotStore(
+            Path("logs") / "channel_snapshot.json", self.redis_client,
+            available=lambda: self.health.is_available('redis'),
+            search_params=self.config.get('new_api', {}).get('search_params', '')
+        )
+        self.init_health()
+        self.last_channel_source = None
+        self.pool_index = AccountPoolIndex(self.base_dir)
+        # 账号组汇总表，第一次使用时建表；目录变化由负责写入的一个进程增量同步
+        self.group_table = AccountGroupTable(self.get_db_connection)
+        self.group_table_ready = False
+        self.group_table_lock = threading.Lock()
+        self.group_sync = GroupStageSync(self.group_table, self.pool_index, Path("logs") / "account_groups.lock")
+        self.pool_changed = threading.Event()
+        self.init_broadcaster()
+        self.init_watcher()
+        self.start_pool_sync()
         
     def load_config(self):
         """加载配置文件"""
@@ -42,7 +110,13 @@ class PanelManager:
                     "name": os.getenv('DB_NAME', 'gcp_accounts'),
                     "user": os.getenv('DB_USER', 'gcp_user'),
                     "password": os.getenv('DB_PASSWORD', 'gcp_password_123'),
-                    "charset": "utf8mb4"
+                    "charset": "utf8mb4",
+                    # 每个worker的连接数，未设置时按worker线程数计算
+                    "pool_size": int(os.getenv('DB_POOL_SIZE_PER_WORKER', 0)) or None,
+                    "connect_timeout": int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+                    # 连接全部借出时的最长等待时间，以及判定疑似泄漏的持有时长
+                    "pool_wait_timeout": float(os.getenv('DB_POOL_WAIT_TIMEOUT', 5)),
+                    "pool_leak_seconds": float(os.getenv('DB_POOL_LEAK_SECONDS', 30))
                 },
                 "web_panel": {
                     "secret_key": os.getenv('SECRET_KEY', 'your-secret-key-change-this')
@@ -51,33 +125,86 @@ class PanelManager:
                     "base_url": os.getenv('NEW_API_BASE_URL', 'http://152.53.166.175:3058'),
                     "api_key": os.getenv('NEW_API_TOKEN', ''),
                     "search_path": os.getenv('NEW_API_SEARCH_PATH', '/api/channel/search'),
-                    "search_params": os.getenv('NEW_API_SEARCH_PARAMS', 'keyword=&group=vertex&model=&id_sort=true&tag_mode=false')
+                    "search_params": os.getenv('NEW_API_SEARCH_PARAMS', 'keyword=&group=vertex&model=&id_sort=true&tag_mode=false'),
+                    "page_size": int(os.getenv('NEW_API_PAGE_SIZE', 100)),
+                    "fetch_concurrency": int(os.getenv('NEW_API_FETCH_CONCURRENCY', 4)),
+                    "pool_size": int(os.getenv('NEW_API_POOL_SIZE', 10))
+                },
+                "redis": {
+                    "host": os.getenv('REDIS_HOST', 'redis'),
+                    "port": int(os.getenv('REDIS_PORT', 6379)),
+                    "password": os.getenv('REDIS_PASSWORD') or None
+                },
+                "cache": {
+                    "channels_ttl": int(os.getenv('CACHE_TTL_CHANNELS', 30)),
+                    "stats_ttl": int(os.getenv('CACHE_TTL_STATS', 10)),
+                    "account_pools_ttl": int(os.getenv('CACHE_TTL_ACCOUNT_POOLS', 10)),
+                    "stale_seconds": int(os.getenv('CACHE_STALE_SECONDS', 300)),
+                    # 监控服务发布的渠道快照在此时长内直接使用
+                    "channel_snapshot_max_age": int(os.getenv('CHANNEL_SNAPSHOT_MAX_AGE', 600))
+                },
+                "events": {
+                    "check_interval": int(os.getenv('EVENTS_CHECK_INTERVAL', 5)),
+                    "heartbeat_seconds": int(os.getenv('EVENTS_HEARTBEAT', 15))
                 }
             }
         
         app.secret_key = self.config['web_panel']['secret_key']
     
     def init_database_pool(self):
-        """初始化MySQL连接池"""
-        try:
-            self.db_pool = pooling.MySQLConnectionPool(
-                pool_name="gcp_pool",
-                pool_size=self.config['database'].get('pool_size', 10),
-                pool_reset_session=True,
-                host=self.config['database']['host'],
-                port=self.config['database']['port'],
-                database=self.config['database']['name'],
-                user=self.config['database']['user'],
-                password=self.config['database']['password'],
-                charset=self.config['database']['charset']
+        """
+        准备MySQL连接池：连接池在第一次获取连接时才创建，
+        多worker部署时每个worker在自己的进程里建立连接，不会跨fork共享
+        """
+        self.db_pool = None
+        self.db_pool_lock = threading.Lock()
+        
+        # 配置的连接数是每个worker（进程）的连接数；未配置时取worker线程数的一半，
+        # 没有 WEB_THREADS（直接运行 app.py）时与原来一样使用10个
+        threads = int(os.getenv('WEB_THREADS') or 0)
+        pool_size = self.config['database'].get('pool_size') or (threads // 2 if threads else 10)
+        self.db_pool_size = min(pooling.CNX_POOL_MAXSIZE, max(2, pool_size))
+        if threads and self.db_pool_size < threads / 4:
+            logger.warning(
+                f"数据库连接池只有 {self.db_pool_size} 个连接，worker有 {threads} 个线程，"
+                f"高负载时请求会排队等待连接（DB_POOL_SIZE_PER_WORKER）"
             )
-            logger.info("MySQL连接池初始化成功")
-        except Exception as e:
-            logger.error(f"MySQL连接池初始化失败: {e}")
-            raise
+    
+    def get_db_pool(self):
+        """获取（必要时创建）当前进程的MySQL连接池（带排队等待和指标的包装）"""
+        if self.db_pool is None:
+            with self.db_pool_lock:
+                if self.db_pool is None:
+                    try:
+                        mysql_pool = pooling.MySQLConnectionPool(
+                            pool_name=f"gcp_pool_{os.getpid()}",
+                            pool_size=self.db_pool_size,
+                            pool_reset_session=True,
+                            host=self.config['database']['host'],
+                            port=self.config['database']['port'],
+                            database=self.config['database']['name'],
+                            user=self.config['database']['user'],
+                            password=self.config['database']['password'],
+                            charset=self.config['database']['charset'],
+                            connection_timeout=self.config['database'].get('connect_timeout', 5)
+                        )
+                        self.db_pool = InstrumentedPool(
+                            mysql_pool,
+                            self.db_pool_size,
+                            wait_timeout=self.config['database'].get('pool_wait_timeout', 5),
+                            leak_seconds=self.config['database'].get('pool_leak_seconds', 30)
+                        )
+                        logger.info(f"MySQL连接池初始化成功 (pid={os.getpid()}, pool_size={self.db_pool_size})")
+                    except Exception as e:
+                        logger.error(f"MySQL连接池初始化失败: {e}")
+                        raise
+        return self.db_pool
     
     def init_redis(self):
-        """初始化Redis连接"""
+        """
+        初始化Redis客户端：不在此处连接，第一次使用时才建立连接；
+        redis-py的连接池在fork后会自动重建，每个worker使用自己的连接
+        """
         try:
             if 'redis' in self.config:
                 self.redis_client = redis.Redis(
@@ -85,23 +212,181 @@ class PanelManager:
                     port=self.config['redis']['port'],
                     password=self.config['redis'].get('password'),
                     db=self.config['redis'].get('db', 0),
-                    decode_responses=True
+                    decode_responses=True,
+                    socket_connect_timeout=self.config['redis'].get('connect_timeout', 2)
                 )
-                # 测试连接
-                self.redis_client.ping()
-                logger.info("Redis连接初始化成功")
+                logger.info("Redis客户端初始化成功（首次使用时连接）")
             else:
                 self.redis_client = None
         except Exception as e:
             logger.warning(f"Redis连接失败: {e}")
             self.redis_client = None
     
+    def init_cache(self):
+        """初始化接口响应缓存（Redis不可用时直接计算）"""
+        cache_config = self.config.get('cache', {})
+        self.cache = ResponseCache(
+            self.redis_client,
+            ttls={
+                'channels': cache_config.get('channels_ttl', 30),
+                'stats': cache_config.get('stats_ttl', 10),
+                'account_pools': cache_config.get('account_pools_ttl', 10)
+            },
+            stale_seconds=cache_config.get('stale_seconds', 300),
+            available=lambda: self.health.is_available('redis'),
+            on_error=lambda e: self.health.mark_failed('redis', e)
+        )
+    
+    def init_health(self):
+        """注册MySQL、Redis的检查函数并启动后台检查/重连线程"""
+        def check_mysql():
+            # 单独建立短超时连接，不占用也不等待请求线程使用的连接池：
+            # 连接池繁忙只是负载高，不能据此把MySQL标记为不可用
+            database = self.config['database']
+            conn = mysql.connector.connect(
+                host=database['host'],
+                port=database['port'],
+                database=database['name'],
+                user=database['user'],
+                password=database['password'],
+                charset=database['charset'],
+                connection_timeout=database.get('connect_timeout', 5)
+            )
+            conn.close()
+        
+        # 等待连接池超时（PoolTimeout）等连接池错误不是MySQL故障
+        self.health.register('mysql', check_mysql, ignore=(mysql.connector.errors.PoolError,))
+        if self.redis_client is not None:
+            # Redis不可用期间的缓存清除没有生效，恢复后清除全部缓存
+            self.health.register(
+                'redis', self.redis_client.ping,
+                on_recover=lambda: self.cache.invalidate('channels', *POOL_CACHES)
+            )
+        self.health.start()
+    
+    def invalidate_pool_caches(self, prefixes=()):
+        """面板自身移动账号文件后更新对应账号组的汇总行、清除统计和账号池缓存并立即检查推送"""
+        if prefixes:
+            self.refresh_group_rows(prefixes)
+        self.cache.invalidate(*POOL_CACHES)
+        self.broadcaster.notify()
+    
+    def on_pool_event(self, event):
+        """目录监听的订阅回调：只做标记，汇总表同步和缓存清除由后台线程合并处理"""
+        self.pool_changed.set()
+    
+    def start_pool_sync(self):
+        """
+        后台线程：目录事件在短时间窗口内合并后同步一次账号组汇总表（只有负责写入的进程写入）、
+        清除账号池缓存并检查推送；没有事件时也定期同步，发现未产生事件的修改
+        """
+        watcher_config = self.config.get('watcher', {})
+        debounce = watcher_config.get('debounce_seconds', float(os.getenv('ACCOUNT_WATCHER_DEBOUNCE', 1)))
+        interval = watcher_config.get('sync_interval', 60)
+        
+        def run():
+            while True:
+                triggered = self.pool_changed.wait(interval)
+                if triggered:
+                    time.sleep(debounce)
+                    self.pool_changed.clear()
+                
+                written = None
+                try:
+                    self.ensure_group_table()
+                    written = self.group_sync.sync()
+                except Exception as e:
+                    logger.warning(f"同步账号组汇总表失败: {e}")
+                
+                if triggered or (written and any(written)):
+                    try:
+                        self.cache.invalidate(*POOL_CACHES)
+                        self.broadcaster.notify()
+                    except Exception as e:
+                        logger.warning(f"清除账号池缓存失败: {e}")
+        
+        # 启动后立即同步一次
+        self.pool_changed.set()
+        threading.Thread(target=run, name="pool-sync", daemon=True).start()
+    
+    def ensure_group_table(self):
+        """确保account_groups表存在（各组的阶段和成员数由 GroupStageSync 写入）"""
+        if self.group_table_ready:
+            return
+        with self.group_table_lock:
+            if self.group_table_ready:
+                return
+            self.group_table.ensure_table()
+            self.group_table_ready = True
+    
+    def refresh_group_rows(self, prefixes):
+        """按账号池索引更新指定账号组的阶段和成员数（额度由监控服务汇总）"""
+        try:
+            self.ensure_group_table()
+            counts = self.pool_index.stage_counts(prefixes)
+            stage_rows = []
+            deleted = []
+            for prefix in prefixes:
+                if prefix in counts:
+                    stage_rows.append((prefix, *group_stage(counts[prefix])))
+                else:
+                    deleted.append(prefix)
+            self.group_table.write(stage_rows=stage_rows, deleted=deleted)
+        except Exception as e:
+            # 汇总表更新失败不影响文件操作，下次同步时纠正
+            logger.warning(f"更新账号组汇总表失败 {prefixes}: {e}")
+    
+    def init_broadcaster(self):
+        """初始化页面推送：统计、账号池、渠道、预测四个主题（前三个经过响应缓存，多个进程共享计算结果）"""
+        events_config = self.config.get('events', {})
+        self.broadcaster = UpdateBroadcaster(
+            check_interval=events_config.get('check_interval', 5),
+            heartbeat_seconds=events_config.get('heartbeat_seconds', 15)
+        )
+        self.broadcaster.register('stats', lambda: self.cache.get('stats', self.get_account_statistics)[0])
+        self.broadcaster.register('account_pools', lambda: self.cache.get('account_pools', self.get_all_account_pools)[0])
+        # 获取失败（空列表）时不推送，保留页面上的数据
+        self.broadcaster.register(
+            'channels',
+            lambda: self.cache.get('channels', self.get_channel_data, should_cache=bool)[0] or None,
+            key='id'
+        )
+        self.broadcaster.register('forecast', self.get_forecast)
+    
+    def init_watcher(self):
+        """启动账号目录监听，把其他进程的文件移动实时同步到账号池索引"""
+        watcher_config = self.config.get('watcher', {})
+        self.watcher = None
+        
+        if not watcher_config.get('enabled', os.getenv('ACCOUNT_WATCHER', 'true').lower() == 'true'):
+            logger.info("账号目录监听已禁用，账号池索引按目录修改时间刷新")
+            return
+        
+        watcher = AccountWatcher(
+            self.base_dir,
+            force_polling=watcher_config.get('force_polling', os.getenv('ACCOUNT_WATCHER_POLLING', 'false').lower() == 'true'),
+            poll_interval=watcher_config.get('poll_interval', 5)
+        )
+        watcher.subscribe(self.pool_index.apply_event)
+        watcher.subscribe(self.on_pool_event)
+        
+        if watcher.start():
+            self.watcher = watcher
+            self.pool_index.mark_watched()
+    
     def get_db_connection(self):
-        """获取数据库连接"""
-        return self.db_pool.get_connection()
+        """获取数据库连接；MySQL不可用时立即抛出DependencyUnavailable，不等待连接超时"""
+        self.health.ensure_available('mysql')
+        try:
+            return self.get_db_pool().get_connection()
+        except mysql.connector.Error as e:
+            # 等待可用连接超时（PoolTimeout）等连接池错误在注册时已排除，不会标记为不可用
+            self.health.mark_failed('mysql', e)
+            raise
     
     def get_account_statistics(self):
-        """获取账号统计信息"""
+        """获取账号统计信息（账号组数量来自account_groups表）"""
+        self.ensure_group_table()
         conn = self.get_db_connection()
         cursor = conn.cursor(dictionary=True)
         
@@ -124,11 +409,12 @@ class PanelManager:
                 elif row['current_status'] == 'disabled':
                     stats['disabled_channels'] = row['count']
             
-            # 统计文件夹中的账号组
-            stats['fresh_groups'] = len(self.get_account_groups('fresh'))
-            stats['activated_groups'] = len(self.get_account_groups('activated'))
-            stats['pending_activation'] = len(self.get_account_groups('exhausted_300'))
-            stats['exhausted_100'] = len(self.get_account_groups('exhausted_100'))
+            # 各阶段的完整账号组
+            group_counts = self.group_table.count_complete_by_stage(cursor)
+            stats['fresh_groups'] = group_counts.get('fresh', 0)
+            stats['activated_groups'] = group_counts.get('activated', 0)
+            stats['pending_activation'] = group_counts.get('exhausted_300', 0)
+            stats['exhausted_100'] = group_counts.get('exhausted_100', 0)
             
             return stats
             
@@ -137,33 +423,8 @@ class PanelManager:
             conn.close()
     
     def get_account_groups(self, directory):
-        """获取目录中的账号组"""
-        dir_path = self.base_dir / directory
-        if not dir_path.exists():
-            return {}
-            
-        files = list(dir_path.glob("*.json"))
-        groups = {}
-        
-        for file in files:
-            name_parts = file.stem.split('-')
-            if len(name_parts) >= 4:
-                prefix = '-'.join(name_parts[:-1])
-                # 处理激活账号的情况
-                if prefix.endswith('-actived'):
-                    prefix = prefix.replace('-actived', '')
-                
-                if prefix not in groups:
-                    groups[prefix] = []
-                groups[prefix].append({
-                    'file': file.name,
-                    'path': str(file),
-                    'size': file.stat().st_size,
-                    'modified': datetime.fromtimestamp(file.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                })
-        
-        # 只返回有3个文件的完整组
-        return {prefix: files for prefix, files in groups.items() if len(files) == 3}
+        """获取目录中的账号组（只返回有3个文件的完整组）"""
+        return self.pool_index.get_groups(directory)
     
     def get_all_account_pools(self):
         """获取所有账号池的信息"""
@@ -175,43 +436,67 @@ class PanelManager:
         
         return pools
     
-    def get_pending_activation_accounts(self):
-        """获取待激活的账号详情"""
+    def get_pending_activation_accounts(self, page=1, per_page=50, sort='quota_desc'):
+        """
+        获取待激活的账号详情（分页）
+        账号组和汇总的已用额度从account_groups表按 (stage, used_quota) 索引分页读取，
+        文件列表和账号使用情况的最后更新时间只取当前页的账号组
+        Args:
+            sort: quota_desc 按已用额度从高到低 / quota_asc 从低到高 / prefix 按名称
+        Returns:
+            dict: accounts 当前页账号组, total 账号组总数, page, per_page, pages, sort
+        """
+        self.ensure_group_table()
+        page = max(1, page)
+        rows, total = self.group_table.page_complete('exhausted_300', sort, (page - 1) * per_page, per_page)
+        pages = max(1, -(-total // per_page))
+        if page > pages:
+            page = pages
+            rows, total = self.group_table.page_complete('exhausted_300', sort, (page - 1) * per_page, per_page)
+        
         groups = self.get_account_groups('exhausted_300')
+        page_groups = [(row, groups[row['prefix']]) for row in rows if row['prefix'] in groups]
+        last_updated = self.get_usage_updated_times(
+            [Path(f.file).stem for _, group in page_groups for f in group.files]
+        )
         
-        # 获取数据库中的使用情况信息
-        conn = self.get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        result = []
+        # 不在索引中的组：文件刚被移走，汇总表尚未更新
+        for row, group in page_groups:
+            total_quota = row['used_quota'] or 0
+            member_times = [last_updated[Path(f.file).stem] for f in group.files if Path(f.file).stem in last_updated]
+            result.append({
+                'prefix': row['prefix'],
+                'files': group.files,
+                'total_quota': total_quota,
+                'quota_formatted': f"${total_quota / 500000:.2f}" if total_quota else "$0.00",
+                'file_count': group.file_count,
+                # 组内账号使用情况的最后更新时间
+                'last_updated': max(member_times, default='')
+            })
         
+        return {
+            'accounts': result,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': pages,
+            'sort': sort
+        }
+    
+    def get_usage_updated_times(self, account_names):
+        """账号使用情况（account_status）的最后更新时间：账号名 -> last_updated"""
+        if not account_names:
+            return {}
+        conn = self.get_db_connection()
+        cursor = conn.cursor()
         try:
-            result = []
-            for prefix, files in groups.items():
-                # 查询该账号组的使用情况
-                file_names = [f['file'].replace('.json', '') for f in files]
-                placeholders = ','.join(['%s'] * len(file_names))
-                
-                cursor.execute(f'''
-                    SELECT account_name, used_quota, last_updated 
-                    FROM account_status 
-                    WHERE account_name IN ({placeholders})
-                ''', file_names)
-                
-                usage_info = {row['account_name']: row for row in cursor.fetchall()}
-                
-                # 计算总使用量
-                total_quota = sum(usage_info.get(name, {}).get('used_quota', 0) for name in file_names)
-                
-                result.append({
-                    'prefix': prefix,
-                    'files': files,
-                    'total_quota': total_quota,
-                    'quota_formatted': f"${total_quota / 500000:.2f}" if total_quota else "$0.00",
-                    'file_count': len(files),
-                    'last_updated': max([usage_info.get(name, {}).get('last_updated', '') for name in file_names], default='')
-                })
-            
-            return result
-            
+            placeholders = ','.join(['%s'] * len(account_names))
+            cursor.execute(f'''
+                SELECT account_name, last_updated FROM account_status
+                WHERE account_name IN ({placeholders}) AND last_updated IS NOT NULL
+            ''', account_names)
+            return dict(cursor.fetchall())
         finally:
             cursor.close()
             conn.close()
@@ -221,80 +506,62 @@ class PanelManager:
         groups = self.get_account_groups('exhausted_100')
         
         result = []
-        for prefix, files in groups.items():
+        for prefix, group in groups.items():
             result.append({
                 'prefix': prefix,
-                'files': files,
-                'file_count': len(files)
+                'files': group.files,
+                'file_count': group.file_count
             })
         
         return result
     
     def get_channel_data(self):
-        """获取New API的所有渠道状态 - 增强版本"""
+        """
+        获取所有渠道状态
+        优先使用监控服务发布的渠道快照，快照不存在或过期时才请求New API，
+        请求成功后发布为新快照供其他进程使用
+        """
+        max_age = self.config.get('cache', {}).get('channel_snapshot_max_age', 600)
+        snapshot = self.snapshot_store.load_fresh(max_age)
+        if snapshot is not None:
+            self.last_channel_source = f"监控快照 v{snapshot['version']}"
+            logger.info(f"使用渠道快照 v{snapshot['version']}（{snapshot['count']} 个渠道，"
+                        f"{time.time() - snapshot['published_at']:.0f} 秒前由 {snapshot['source']} 发布）")
+            return snapshot['channels']
+        
+        logger.info("渠道快照不存在或已过期，从New API获取")
+        channels = [ChannelState.from_api(item) for item in self.fetch_channel_data()]
+        if channels:
+            self.snapshot_store.publish(channels, source="panel")
+        self.last_channel_source = "实时数据"
+        return channels
+    
+    def fetch_channel_data(self):
+        """从New API获取所有渠道状态 - 分页流式获取"""
         try:
             # 检查配置
             config = self.config.get('new_api', {})
-            api_key = config.get('api_key')
-            base_url = config.get('base_url')
             
-            if not api_key:
+            if not config.get('api_key'):
                 logger.error("NEW_API_TOKEN 未配置")
                 return []
             
-            if not base_url:
+            if not config.get('base_url'):
                 logger.error("NEW_API_BASE_URL 未配置")
                 return []
             
-            # 构建完整的API URL
-            search_path = config.get('search_path', '/api/channel/search')
-            search_params = config.get('search_params', 'keyword=&group=vertex&model=&id_sort=true&tag_mode=false')
-            
-            api_url = f"{base_url}{search_path}?{search_params}"
-            
-            headers = {
-                "accept": "application/json, text/plain, */*",
-                "accept-language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "cache-control": "no-store",
-                "new-api-user": "1",
-                "authorization": f"Bearer {api_key}",
-                "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            }
+            items = self.api_client.get_channels()
+            logger.info(f"成功从New API获取 {len(items)} 个渠道")
             
-            logger.info(f"请求New API: {api_url}")
+            # 记录每个渠道的基本信息用于调试
+            for item in items[:3]:  # 只记录前3个
+                logger.info(f"渠道: {item.get('name')} status={item.get('status')} quota={item.get('used_quota')}")
             
-            response = requests.get(api_url, headers=headers, timeout=30)
-            
-            logger.info(f"New API响应状态: {response.status_code}")
-            
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    logger.info(f"New API返回数据结构: success={data.get('success')}")
-                    
-                    if data.get('success', False):
-                        items = data.get('data', {}).get('items', [])
-                        logger.info(f"成功从New API获取 {len(items)} 个渠道")
-                        
-                        # 记录每个渠道的基本信息用于调试
-                        for item in items[:3]:  # 只记录前3个
-                            logger.info(f"渠道: {item.get('name')} status={item.get('status')} quota={item.get('used_quota')}")
-                        
-                        return items
-                    else:
-                        error_msg = data.get('message', '未知错误')
-                        logger.error(f"New API返回失败: {error_msg}")
-                        return []
-                        
-                except json.JSONDecodeError as e:
-                    logger.error(f"New API返回数据JSON解析失败: {e}")
-                    logger.error(f"响应内容: {response.text[:500]}")
-                    return []
-            else:
-                logger.error(f"New API请求失败: HTTP {response.status_code}")
-                logger.error(f"响应内容: {response.text[:500]}")
-                return []
+            return items
                 
+        except NewAPIError as e:
+            logger.error(f"New API请求失败: {e}")
+            return []
         except requests.exceptions.Timeout:
             logger.error("New API请求超时")
             return []
@@ -313,27 +580,35 @@ class PanelManager:
         
         # 移动并重命名文件
         moved_files = []
-        for suffix in ['01', '02', '03']:
-            source_file = source_dir / f"{account_prefix}-{suffix}.json"
-            target_file = target_dir / f"{account_prefix}-{suffix}-actived.json"
+        with self.pool_index.changing("exhausted_300", "activated") as change:
+            for suffix in ['01', '02', '03']:
+                source_file = source_dir / f"{account_prefix}-{suffix}.json"
+                target_file = target_dir / f"{account_prefix}-{suffix}-actived.json"
+                
+                if source_file.exists():
+                    shutil.move(str(source_file), str(target_file))
+                    moved_files.append(str(target_file))
+                    change.moved("exhausted_300", source_file.name, "activated", target_file.name)
             
-            if source_file.exists():
-                shutil.move(str(source_file), str(target_file))
-                moved_files.append(str(target_file))
-        
-        if len(moved_files) == 3:
-            # 记录激活日志和数据库
-            self.log_activation(account_prefix)
-            self.update_activation_in_db(account_prefix)
-            return True
-        else:
-            # 如果失败，回滚已移动的文件
-            for file_path in moved_files:
-                if Path(file_path).exists():
-                    original_name = Path(file_path).name.replace('-actived', '')
-                    original_path = source_dir / original_name
-                    shutil.move(file_path, str(original_path))
-            return False
+            if len(moved_files) != 3:
+                # 如果失败，回滚已移动的文件
+                for file_path in moved_files:
+                    if Path(file_path).exists():
+                        original_name = Path(file_path).name.replace('-actived', '')
+                        original_path = source_dir / original_name
+                        shutil.move(file_path, str(original_path))
+                        change.moved("activated", Path(file_path).name, "exhausted_300", original_name)
+                return False
+        
+        # 记录激活日志和数据库
+        self.log_activation(account_prefix)
+        self.update_activation_in_db(account_prefix)
+        self.invalidate_pool_caches(prefixes=[account_prefix])
+        try:
+            self.group_table.set_activation_date(account_prefix, datetime.now())
+        except Exception as e:
+            logger.warning(f"记录账号组激活时间失败 {account_prefix}: {e}")
+        return True
     
     def update_activation_in_db(self, account_prefix):
         """在数据库中更新激活状态"""
@@ -365,22 +640,36 @@ class PanelManager:
             target_dir.mkdir(exist_ok=True)
             
             # 重命名并移动到归档
-            for suffix in ['01', '02', '03']:
-                source_file = source_dir / f"{account_prefix}-{suffix}-actived.json"
-                target_file = target_dir / f"{account_prefix}-{suffix}-used.json"
-                
-                if source_file.exists():
-                    shutil.move(str(source_file), str(target_file))
+            with self.pool_index.changing("exhausted_100", "archive") as change:
+                for suffix in ['01', '02', '03']:
+                    source_file = source_dir / f"{account_prefix}-{suffix}-actived.json"
+                    target_file = target_dir / f"{account_prefix}-{suffix}-used.json"
+                    
+                    if source_file.exists():
+                        shutil.move(str(source_file), str(target_file))
+                        change.moved("exhausted_100", source_file.name, "archive", target_file.name)
         
         elif action == 'delete':
             # 直接删除
-            for suffix in ['01', '02', '03']:
-                source_file = source_dir / f"{account_prefix}-{suffix}-actived.json"
-                if source_file.exists():
-                    source_file.unlink()
+            with self.pool_index.changing("exhausted_100") as change:
+                for suffix in ['01', '02', '03']:
+                    source_file = source_dir / f"{account_prefix}-{suffix}-actived.json"
+                    if source_file.exists():
+                        source_file.unlink()
+                        change.removed("exhausted_100", source_file.name)
         
+        self.invalidate_pool_caches(prefixes=[account_prefix])
         return True
     
+    def get_forecast(self):
+        """读取监控服务写入的额度预测结果，尚未生成时返回None"""
+        forecast_path = Path("logs/forecast.json")
+        try:
+            with open(forecast_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
     def log_activation(self, account_prefix):
         """记录激活日志"""
         log_path = Path("logs/panel.log")
@@ -404,6 +693,24 @@ class PanelManager:
 panel_manager = PanelManager()
 
 
+@app.route('/api/events')
+def stream_events():
+    """推送数据变化（Server-Sent Events），topics 参数指定订阅的主题，逗号分隔"""
+    topics = [topic for topic in request.args.get('topics', 'stats').split(',') if topic]
+    unknown = [topic for topic in topics if topic not in panel_manager.broadcaster.topics]
+    if unknown:
+        return jsonify({'success': False, 'message': f'未知的推送主题: {", ".join(unknown)}'}), 400
+    
+    response = Response(
+        stream_with_context(panel_manager.broadcaster.stream(topics)),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭Nginx等反向代理的缓冲，消息立即到达页面
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # ===== 网页模板路由 =====
 
 @app.route('/api/debug/new-api')
@@ -421,9 +728,21 @@ def debug_new_api():
             },
             'test_result': None,
             'channels_count': 0,
-            'sample_channels': []
+            'sample_channels': [],
+            'snapshot': None
         }
         
+        snapshot = panel_manager.snapshot_store.load()
+        if snapshot is not None:
+            debug_info['snapshot'] = {
+                'version': snapshot['version'],
+                'source': snapshot['source'],
+                'count': snapshot['count'],
+                'search_params': snapshot.get('search_params'),
+                'published_at': datetime.fromtimestamp(snapshot['published_at']).isoformat(),
+                'age_seconds': round(time.time() - snapshot['published_at'])
+            }
+        
         # 测试API调用
         try:
             channels = panel_manager.get_channel_data()
@@ -442,21 +761,58 @@ def debug_new_api():
 
 @app.route('/health')
 def health_check():
-    """健康检查端点"""
+    """健康检查端点：依赖不可用时返回degraded（HTTP 200），面板进程本身仍在服务"""
     try:
-        # 检查数据库连接
-        conn = panel_manager.get_db_connection()
-        conn.close()
+        health = panel_manager.health
+        # 可用的依赖实际检查一次；不可用的依赖由后台线程重连，这里直接报告当前状态
+        for name in health.dependencies:
+            if health.is_available(name):
+                health.probe(name)
         
-        # 检查Redis连接（如果启用）
-        if panel_manager.redis_client:
-            panel_manager.redis_client.ping()
-        
-        return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+        status, dependencies = health.status()
+        return jsonify({
+            'status': status,
+            'dependencies': dependencies,
+            'timestamp': datetime.now().isoformat()
+        })
     except Exception as e:
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus格式指标：数据库连接池利用率、New API请求耗时、依赖状态（每个worker各自统计）"""
+    writer = MetricsWriter()
+    worker = {'pid': os.getpid()}
+    
+    _, dependencies = panel_manager.health.status()
+    for name, dependency in dependencies.items():
+        writer.gauge('gcp_dependency_up', '依赖是否可用', int(dependency['state'] != 'down'),
+                     {**worker, 'dependency': name})
+    
+    if panel_manager.db_pool is not None:
+        pool = panel_manager.db_pool.stats()
+        writer.gauge('gcp_db_pool_size', '连接池大小', pool['pool_size'], worker)
+        writer.gauge('gcp_db_pool_in_use', '已借出的连接数', pool['in_use'], worker)
+        writer.gauge('gcp_db_pool_waiting', '正在等待连接的请求数', pool['waiting'], worker)
+        writer.gauge('gcp_db_pool_max_in_use', '同时借出连接数的最大值', pool['max_in_use'], worker)
+        writer.counter('gcp_db_pool_checkouts_total', '借出连接次数', pool['checkouts_total'], worker)
+        writer.counter('gcp_db_pool_timeouts_total', '等待连接超时次数', pool['timeouts_total'], worker)
+        writer.counter('gcp_db_pool_leaks_total', '疑似泄漏（持有过久）的连接数', pool['leaks_total'], worker)
+        writer.histogram('gcp_db_pool_wait_seconds', '等待借出连接的耗时', pool['wait_seconds'], worker)
+        writer.histogram('gcp_db_pool_hold_seconds', '连接持有时长', pool['hold_seconds'], worker)
+    
+    # 同一指标族的行需要连续输出
+    latency = sorted(panel_manager.api_client.latency_snapshot().items())
+    for endpoint, snapshot in latency:
+        writer.histogram('gcp_new_api_request_seconds', 'New API请求耗时', snapshot, {**worker, 'endpoint': endpoint})
+    for endpoint, snapshot in latency:
+        writer.counter('gcp_new_api_request_errors_total', 'New API请求失败次数', snapshot['errors'],
+                       {**worker, 'endpoint': endpoint})
+    
+    return Response(writer.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/')
 def dashboard():
     """仪表板页面"""
@@ -466,9 +822,21 @@ def dashboard():
 
 @app.route('/pending-activation')
 def pending_activation():
-    """待激活账号页面"""
-    accounts = panel_manager.get_pending_activation_accounts()
-    return render_template('pending_activation.html', accounts=accounts)
+    """待激活账号页面（分页，默认按已用额度从高到低）"""
+    sort = request.args.get('sort', 'quota_desc')
+    if sort not in PENDING_SORTS:
+        sort = 'quota_desc'
+    per_page = request.args.get('per_page', 50, type=int)
+    if per_page not in PENDING_PAGE_SIZES:
+        per_page = 50
+    
+    pagination = panel_manager.get_pending_activation_accounts(
+        page=request.args.get('page', 1, type=int), per_page=per_page, sort=sort
+    )
+    return render_template(
+        'pending_activation.html', accounts=pagination['accounts'], pagination=pagination,
+        page_sizes=PENDING_PAGE_SIZES
+    )
 
 
 @app.route('/exhausted-100')
@@ -534,21 +902,49 @@ def cleanup_account():
 
 @app.route('/api/stats')
 def get_stats():
-    """获取统计信息API"""
-    stats = panel_manager.get_account_statistics()
-    return jsonify(stats)
+    """获取统计信息API（Redis缓存）"""
+    stats, cache_status = panel_manager.cache.get('stats', panel_manager.get_account_statistics)
+    response = jsonify(stats)
+    response.headers['X-Cache'] = cache_status
+    return response
+
+
+@app.route('/api/forecast')
+def get_forecast():
+    """获取额度消耗预测API（由监控服务每个检查周期生成）"""
+    try:
+        forecast = panel_manager.get_forecast()
+        if forecast is None:
+            return jsonify({
+                'success': False,
+                'message': '暂无预测数据，请等待监控服务完成一次检查'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': forecast,
+            'message': '获取预测数据成功'
+        })
+    except Exception as e:
+        logger.error(f"获取预测数据失败: {e}")
+        return jsonify({
+            'success': False,
+            'message': f'获取预测数据失败: {str(e)}'
+        }), 500
 
 
 @app.route('/api/account-pools')
 def get_account_pools():
-    """获取账号池数据API"""
+    """获取账号池数据API（Redis缓存）"""
     try:
-        pools_data = panel_manager.get_all_account_pools()
-        return jsonify({
+        pools_data, cache_status = panel_manager.cache.get('account_pools', panel_manager.get_all_account_pools)
+        response = jsonify({
             'success': True,
             'data': pools_data,
             'message': '获取账号池数据成功'
         })
+        response.headers['X-Cache'] = cache_status
+        return response
     except Exception as e:
         logger.error(f"获取账号池数据失败: {e}")
         return jsonify({
@@ -559,10 +955,12 @@ def get_account_pools():
 
 @app.route('/api/channels')
 def get_channels():
-    """获取渠道数据API - 直接从New API获取真实数据"""
+    """获取渠道数据API - 从New API获取，Redis缓存（过期后先返回旧数据并后台刷新）"""
     try:
-        # 直接调用 New API 获取最新数据
-        channels_data = panel_manager.get_channel_data()
+        # 获取失败时返回空列表，不缓存
+        channels_data, cache_status = panel_manager.cache.get(
+            'channels', panel_manager.get_channel_data, should_cache=bool
+        )
         
         if channels_data is None:
             return jsonify({
@@ -571,14 +969,16 @@ def get_channels():
                 'data': []
             }), 500
         
-        logger.info(f"成功从New API获取 {len(channels_data)} 个渠道数据")
+        logger.info(f"成功获取 {len(channels_data)} 个渠道数据 (缓存: {cache_status})")
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'data': channels_data,
             'message': f'成功获取 {len(channels_data)} 个渠道数据',
-            'source': 'New API (实时数据)'
+            'source': f'New API ({panel_manager.last_channel_source})' if cache_status in ('miss', 'bypass') else 'New API (缓存)'
         })
+        response.headers['X-Cache'] = cache_status
+        return response
         
     except Exception as e:
         logger.error(f"获取渠道数据失败: {e}")
@@ -607,21 +1007,16 @@ def upload_json():
         
         # 读取文件内容
         try:
-            file_content = file.read().decode('utf-8')
-            json_data = json.loads(file_content)
-        except json.JSONDecodeError:
-            return jsonify({'success': False, 'message': 'JSON文件格式错误'}), 400
+            material = parse_key_material(file.read())
         except Exception as e:
             return jsonify({'success': False, 'message': f'文件读取失败: {str(e)}'}), 400
         
-        # 验证JSON是否为GCP服务账号密钥
-        required_fields = ['type', 'project_id', 'private_key_id', 'private_key', 'client_email']
-        for field in required_fields:
-            if field not in json_data:
-                return jsonify({'success': False, 'message': f'缺少必要字段: {field}'}), 400
-        
-        if json_data.get('type') != 'service_account':
-            return jsonify({'success': False, 'message': '不是有效的服务账号密钥文件'}), 400
+        # 验证JSON是否为GCP服务账号密钥（与导入工具、上传脚本使用同一套校验）
+        if material.json_error:
+            return jsonify({'success': False, 'message': 'JSON文件格式错误'}), 400
+        if not material.valid:
+            return jsonify({'success': False, 'message': material.key_error}), 400
+        json_data = material.data
         
         # 保存文件到fresh目录
         fresh_dir = panel_manager.base_dir / "fresh"
@@ -639,8 +1034,11 @@ def upload_json():
             return jsonify({'success': False, 'message': f'文件 {filename} 已存在'}), 409
         
         # 保存文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
+        with panel_manager.pool_index.changing("fresh") as change:
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump(json_data, f, indent=2, ensure_ascii=False)
+            change.added("fresh", filename)
+        panel_manager.invalidate_pool_caches(prefixes=[p for p in [parse_group_prefix(Path(filename).stem)] if p])
         
         # 记录上传日志
         panel_manager.log_json_upload(filename, json_data.get('project_id'))
@@ -685,29 +1083,16 @@ def batch_upload_json():
                 continue
             
             try:
-                # 读取文件内容
-                file_content = file.read().decode('utf-8')
-                json_data = json.loads(file_content)
-                
-                # 验证JSON
-                required_fields = ['type', 'project_id', 'private_key_id', 'private_key', 'client_email']
-                missing_fields = [field for field in required_fields if field not in json_data]
-                
-                if missing_fields:
-                    results.append({
-                        'filename': file.filename,
-                        'success': False,
-                        'message': f'缺少必要字段: {", ".join(missing_fields)}'
-                    })
-                    continue
-                
-                if json_data.get('type') != 'service_account':
+                # 读取并验证JSON
+                material = parse_key_material(file.read())
+                if not material.valid:
                     results.append({
                         'filename': file.filename,
                         'success': False,
-                        'message': '不是有效的服务账号密钥文件'
+                        'message': 'JSON格式错误' if material.json_error else material.key_error
                     })
                     continue
+                json_data = material.data
                 
                 # 保存文件
                 fresh_dir = panel_manager.base_dir / "fresh"
@@ -724,8 +1109,13 @@ def batch_upload_json():
                     continue
                 
                 # 保存文件
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(json_data, f, indent=2, ensure_ascii=False)
+                with panel_manager.pool_index.changing("fresh") as change:
+                    with open(file_path, 'w', encoding='utf-8') as f:
+                        json.dump(json_data, f, indent=2, ensure_ascii=False)
+                    change.added("fresh", file.filename)
+                panel_manager.invalidate_pool_caches(
+                    prefixes=[p for p in [parse_group_prefix(Path(file.filename).stem)] if p]
+                )
                 
                 results.append({
                     'filename': file.filename,
@@ -740,12 +1130,6 @@ def batch_upload_json():
                 # 记录日志
                 panel_manager.log_json_upload(file.filename, json_data.get('project_id'))
                 
-            except json.JSONDecodeError:
-                results.append({
-                    'filename': file.filename,
-                    'success': False,
-                    'message': 'JSON格式错误'
-                })
             except Exception as e:
                 results.append({
                     'filename': file.filename,
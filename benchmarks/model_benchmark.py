@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+记录类型与JSON序列化压测
+在内存中生成合成账号池（默认10万个文件）和渠道列表，对比原来的字典 + 标准库json
+与 scripts.models 的 __slots__ 记录 + scripts.fast_json（安装了 orjson 时使用 orjson）：
+
+    python benchmarks/model_benchmark.py --files 100000 --channels 20000 --runs 5
+
+账号池：构建 get_groups 结果的耗时、记录占用的内存、序列化为 /api/account-pools 响应的耗时
+（面板的账号池索引在请求间复用记录，重复序列化不再格式化修改时间）；
+渠道：New API原始渠道列表与精简后的 ChannelState 的快照大小和序列化耗时。
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from scripts import fast_json
+from scripts.account_scanner import GROUP_SIZE
+from scripts.models import AccountFile, AccountGroup, ChannelState
+
+
+def build_index(file_count):
+    """合成索引：前缀 -> [(文件名, 路径, 大小, 修改时间)]"""
+    now = time.time()
+    index = {}
+    for i in range(file_count // GROUP_SIZE):
+        prefix = f"proj-bench{i:06d}-vip"
+        index[prefix] = [
+            (name, f"/app/account/exhausted_300/{name}", 2300 + number, now - i)
+            for number in range(1, GROUP_SIZE + 1)
+            for name in [f"{prefix}-{number:02d}.json"]
+        ]
+    return index
+
+
+def build_channels(count):
+    """合成New API渠道列表（包含面板用不到的配置字段）"""
+    return [
+        {
+            'id': i, 'type': 41, 'key': '', 'openai_organization': None, 'test_model': None,
+            'status': 1 if i % 5 else 2, 'name': f"proj-bench{i:06d}-vip-01-actived", 'weight': 0,
+            'created_time': 1700000000 + i, 'test_time': 1700000000, 'response_time': 812,
+            'base_url': '', 'other': '', 'balance': 0, 'balance_updated_time': 0,
+            'models': 'gemini-2.5-pro,gemini-2.5-flash', 'group': 'default', 'used_quota': i * 1000,
+            'model_mapping': '', 'status_code_mapping': '', 'priority': 0, 'auto_ban': 1,
+            'other_info': '', 'tag': 'vertex', 'setting': None, 'param_override': None,
+            'header_override': None, 'remark': None,
+            'channel_info': {'is_multi_key': False, 'multi_key_size': 0, 'multi_key_status_list': None,
+                             'multi_key_polling_index': 0, 'multi_key_mode': ''}
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_groups(index):
+    """原来的 get_groups：每个文件一个字典，修改时间逐个格式化"""
+    return {
+        prefix: [
+            {
+                'file': name,
+                'path': path,
+                'size': size,
+                'modified': datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+            }
+            for name, path, size, mtime in members
+        ]
+        for prefix, members in index.items()
+    }
+
+
+def model_groups(index):
+    return {
+        prefix: AccountGroup(prefix, 'exhausted_300', [AccountFile(*member) for member in members])
+        for prefix, members in index.items()
+    }
+
+
+def legacy_dumps(data):
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def model_dumps(data):
+    return fast_json.dumps(data, default=str)
+
+
+def measure(function, argument, runs):
+    """返回 (结果, 中位数毫秒)"""
+    result, timings = run(function, argument, runs)
+    return result, round(statistics.median(timings) * 1000, 1)
+
+
+def measure_first(function, argument, runs):
+    """返回 (结果, {第一次, 之后的中位数})：记录第一次序列化时格式化修改时间，之后复用"""
+    result, timings = run(function, argument, runs)
+    return result, {
+        'first_ms': round(timings[0] * 1000, 1),
+        'repeat_median_ms': round(statistics.median(timings[1:] or timings) * 1000, 1)
+    }
+
+
+def run(function, argument, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function(argument)
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def measure_memory(function, argument):
+    """构建结果占用的内存（tracemalloc 统计的净分配）"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = function(argument)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return round((after - before) / 1024 / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='记录类型与JSON序列化压测')
+    parser.add_argument('--files', type=int, default=100000, help='合成账号文件数')
+    parser.add_argument('--channels', type=int, default=20000, help='合成渠道数')
+    parser.add_argument('--runs', type=int, default=5, help='每项测量次数（取中位数）')
+    args = parser.parse_args()
+
+    index = build_index(args.files)
+    channels = build_channels(args.channels)
+
+    legacy, legacy_build = measure(legacy_groups, index, args.runs)
+    models, model_build = measure(model_groups, index, args.runs)
+    legacy_payload, legacy_dump = measure(legacy_dumps, {'exhausted_300': legacy}, args.runs)
+    model_payload, model_dump = measure_first(model_dumps, {'exhausted_300': models}, args.runs)
+
+    states, compact_build = measure(lambda items: [ChannelState.from_api(c) for c in items], channels, args.runs)
+    raw_snapshot, raw_dump = measure(legacy_dumps, channels, args.runs)
+    compact_snapshot, compact_dump = measure(model_dumps, states, args.runs)
+
+    report = {
+        'json_backend': 'orjson' if fast_json.orjson is not None else 'json',
+        'files': len(index) * GROUP_SIZE,
+        'runs': args.runs,
+        'account_pools': {
+            'build_ms': {'legacy_dicts': legacy_build, 'models': model_build},
+            'memory_mb': {'legacy_dicts': measure_memory(legacy_groups, index),
+                          'models': measure_memory(model_groups, index)},
+            'dumps_ms': {'legacy_json': legacy_dump, 'fast_json': model_dump},
+            'same_payload': json.loads(legacy_payload) == json.loads(model_payload)
+        },
+        'channels': {
+            'count': len(channels),
+            'compact_ms': compact_build,
+            'dumps_ms': {'raw_json': raw_dump, 'compact_fast_json': compact_dump},
+            'snapshot_kb': {'raw': round(len(raw_snapshot.encode('utf-8')) / 1024, 1),
+                            'compact': round(len(compact_snapshot.encode('utf-8')) / 1024, 1)}
+        }
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
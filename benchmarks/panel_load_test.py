@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web面板压测脚本
+用固定数量的并发客户端持续请求面板接口，统计吞吐量和延迟分位数。
+同时可以让一部分客户端请求慢接口（默认 /api/channels，最长阻塞30秒），
+观察慢请求对其他接口的影响：
+
+    # 开发服务器
+    python app.py
+    python benchmarks/panel_load_test.py --url http://127.0.0.1:5000 --slow-clients 4
+
+    # gunicorn 多worker
+    gunicorn -c docker/gunicorn.conf.py wsgi:app
+    python benchmarks/panel_load_test.py --url http://127.0.0.1:5000 --slow-clients 4
+
+两次结果中快接口的吞吐量和 p95/p99 延迟即为差异。
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    """已排序数据的分位数（最近秩）"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LoadTest:
+    """并发请求并记录每个接口的延迟和错误"""
+
+    def __init__(self, base_url, paths, slow_path, clients, slow_clients, duration, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.paths = paths
+        self.slow_path = slow_path
+        self.clients = clients
+        self.slow_clients = slow_clients
+        self.duration = duration
+        self.timeout = timeout
+
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.deadline = 0
+
+    def worker(self, paths):
+        session = requests.Session()
+        i = 0
+        while time.monotonic() < self.deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = session.get(self.base_url + path, timeout=self.timeout)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                if ok:
+                    self.latencies[path].append(elapsed)
+                else:
+                    self.errors[path] += 1
+
+    def run(self):
+        self.deadline = time.monotonic() + self.duration
+        threads = [threading.Thread(target=self.worker, args=(self.paths,)) for _ in range(self.clients)]
+        threads += [threading.Thread(target=self.worker, args=([self.slow_path],)) for _ in range(self.slow_clients)]
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.monotonic() - started)
+
+    def report(self, elapsed):
+        result = {'duration_seconds': round(elapsed, 2), 'paths': {}}
+        total_fast = 0
+        for path in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies[path])
+            total_fast += len(values) if path != self.slow_path else 0
+            result['paths'][path] = {
+                'requests': len(values),
+                'errors': self.errors[path],
+                'rps': round(len(values) / elapsed, 1),
+                'p50_ms': round(percentile(values, 50) * 1000, 1) if values else None,
+                'p95_ms': round(percentile(values, 95) * 1000, 1) if values else None,
+                'p99_ms': round(percentile(values, 99) * 1000, 1) if values else None,
+                'max_ms': round(values[-1] * 1000, 1) if values else None
+            }
+        result['fast_rps'] = round(total_fast / elapsed, 1)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web面板压测')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='面板地址')
+    parser.add_argument('--paths', default='/api/stats,/api/account-pools,/health',
+                        help='快接口，逗号分隔，每个客户端轮流请求')
+    parser.add_argument('--slow-path', default='/api/channels', help='慢接口')
+    parser.add_argument('--clients', type=int, default=16, help='请求快接口的并发客户端数')
+    parser.add_argument('--slow-clients', type=int, default=0, help='持续请求慢接口的并发客户端数')
+    parser.add_argument('--duration', type=float, default=30, help='压测时长（秒）')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时（秒）')
+    parser.add_argument('--json', action='store_true', help='以JSON输出结果')
+    args = parser.parse_args()
+
+    test = LoadTest(
+        args.url,
+        [path for path in args.paths.split(',') if path],
+        args.slow_path,
+        args.clients,
+        args.slow_clients,
+        args.duration,
+        args.timeout
+    )
+    result = test.run()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    print(f"压测时长 {result['duration_seconds']} 秒，快接口总吞吐 {result['fast_rps']} 请求/秒")
+    print(f"{'接口':<24}{'请求数':>8}{'错误':>6}{'rps':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for path, stats in result['paths'].items():
+        print(f"{path:<24}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>8}"
+              f"{str(stats['p50_ms']):>10}{str(stats['p95_ms']):>10}{str(stats['p99_ms']):>10}{str(stats['max_ms']):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号目录扫描压测
+在临时目录生成合成账号树（默认10万个文件，分布在各阶段目录，含 -actived / -used 文件和不完整组），
+对比原来的 glob + 逐文件 stat + split 分组方式与 scripts.account_scanner 的单次 os.scandir 扫描：
+
+    python benchmarks/scanner_benchmark.py --files 100000 --runs 3
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from scripts.account_scanner import POOL_DIRECTORIES, scan_tree
+
+# 各阶段文件后缀
+STAGE_SUFFIX = {'activated': '-actived', 'exhausted_100': '-actived', 'archive': '-used'}
+
+
+def build_tree(base_dir, file_count):
+    """按阶段轮流生成账号组，每10组留一个不完整组，返回实际生成的文件数"""
+    for directory in POOL_DIRECTORIES:
+        (base_dir / directory).mkdir(parents=True, exist_ok=True)
+
+    created = 0
+    group = 0
+    while created < file_count:
+        directory = POOL_DIRECTORIES[group % len(POOL_DIRECTORIES)]
+        suffix = STAGE_SUFFIX.get(directory, '')
+        members = 2 if group % 10 == 9 else 3
+        for number in range(1, members + 1):
+            path = base_dir / directory / f"proj-bench{group:06d}-vip-{number:02d}{suffix}.json"
+            path.write_text('{}', encoding='utf-8')
+            created += 1
+        group += 1
+    return created
+
+
+def legacy_scan(base_dir):
+    """原来的实现：glob列出文件，逐个stat取大小，按split('-')分组"""
+    result = {}
+    for directory in POOL_DIRECTORIES:
+        dir_path = base_dir / directory
+        if not dir_path.exists():
+            continue
+        json_files = list(dir_path.glob("*.json"))
+        groups = {}
+        for file_path in json_files:
+            name = file_path.stem
+            if name.endswith('-actived'):
+                name = name[:-8]
+            parts = name.split('-')
+            if len(parts) >= 4:
+                groups.setdefault('-'.join(parts[:-1]), []).append(file_path)
+        total_size = sum(f.stat().st_size for f in json_files)
+        result[directory] = (len([g for g in groups.values() if len(g) == 3]), total_size)
+    return result
+
+
+def shared_scan(base_dir):
+    return {directory: (len(scan.complete()), scan.total_size)
+            for directory, scan in scan_tree(base_dir, with_stat=True).items()}
+
+
+def measure(function, base_dir, runs):
+    timings = []
+    result = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function(base_dir)
+        timings.append(time.perf_counter() - started)
+    return result, {
+        'min_ms': round(min(timings) * 1000, 1),
+        'median_ms': round(statistics.median(timings) * 1000, 1),
+        'max_ms': round(max(timings) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='账号目录扫描压测')
+    parser.add_argument('--files', type=int, default=100000, help='生成的账号文件数')
+    parser.add_argument('--runs', type=int, default=3, help='每种方式的扫描次数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='gcp-scan-bench-') as tmp:
+        base_dir = Path(tmp)
+        started = time.perf_counter()
+        created = build_tree(base_dir, args.files)
+        build_seconds = time.perf_counter() - started
+
+        legacy_result, legacy_timing = measure(legacy_scan, base_dir, args.runs)
+        shared_result, shared_timing = measure(shared_scan, base_dir, args.runs)
+
+    # 原实现不识别 -used 后缀，archive 目录的完整组数会不同
+    mismatched = sorted(d for d in shared_result if shared_result[d] != legacy_result.get(d))
+    report = {
+        'files': created,
+        'build_seconds': round(build_seconds, 2),
+        'runs': args.runs,
+        'legacy_glob_stat': legacy_timing,
+        'account_scanner': shared_timing,
+        'speedup_median': round(legacy_timing['median_ms'] / max(shared_timing['median_ms'], 0.001), 2),
+        'complete_groups': {d: shared_result[d][0] for d in shared_result},
+        'differs_from_legacy': mismatched
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web面板冷启动压测
+在独立子进程中多次导入 app（创建 PanelManager），记录导入耗时和第一次 /health 的耗时。
+默认把 MySQL/Redis 指向不可达地址，验证依赖故障时面板仍能快速启动并报告 degraded：
+
+    python benchmarks/startup_benchmark.py --runs 5
+    python benchmarks/startup_benchmark.py --runs 5 --live   # 使用当前环境的真实依赖
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# 子进程：导入app并用测试客户端请求一次 /health
+CHILD_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/health')
+finished = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'first_health_seconds': finished - imported,
+    'health_status': response.status_code,
+    'health': response.get_json().get('status')
+}))
+"""
+
+# 不可达地址（TEST-NET-1），连接会一直等到超时
+UNREACHABLE_HOST = '192.0.2.1'
+
+
+def run_once(env):
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_CODE],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else '子进程异常退出')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(values):
+    return {
+        'min_ms': round(min(values) * 1000, 1),
+        'median_ms': round(statistics.median(values) * 1000, 1),
+        'max_ms': round(max(values) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web面板冷启动压测')
+    parser.add_argument('--runs', type=int, default=5, help='启动次数')
+    parser.add_argument('--live', action='store_true', help='使用当前环境的MySQL/Redis，而不是不可达地址')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(REPO_ROOT)
+    env.setdefault('ACCOUNT_WATCHER', 'false')
+    if not args.live:
+        env.update({'DB_HOST': UNREACHABLE_HOST, 'REDIS_HOST': UNREACHABLE_HOST, 'DB_CONNECT_TIMEOUT': '2'})
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    report = {
+        'runs': args.runs,
+        'dependencies': 'live' if args.live else 'unreachable',
+        'import': summarize([run['import_seconds'] for run in runs]),
+        'first_health': summarize([run['first_health_seconds'] for run in runs]),
+        'health_results': sorted({f"{run['health_status']} {run['health']}" for run in runs})
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+# docker/gunicorn.conf.py
+# Web面板的gunicorn配置：多worker + 每个worker多线程（gthread）
+# 平滑重载: supervisorctl signal HUP web_panel （逐个重启worker，不中断正在处理的请求）
+import multiprocessing
+import os
+
+bind = f"{os.getenv('WEB_HOST', '0.0.0.0')}:{os.getenv('WEB_PORT', '5000')}"
+
+# worker数默认为CPU核数（最多4个）；每个推送连接（/api/events）会占用一个线程
+workers = int(os.getenv('WEB_WORKERS', min(4, multiprocessing.cpu_count())))
+threads = int(os.getenv('WEB_THREADS', 16))
+worker_class = 'gthread'
+
+# PanelManager按每个worker的线程数确定数据库连接池大小，确保与实际线程数一致
+os.environ['WEB_THREADS'] = str(threads)
+
+# 不预加载应用：每个worker在fork之后自己创建PanelManager，
+# 数据库连接池、目录监听和推送线程都不会跨进程共享
+preload_app = False
+
+# New API请求最长30秒，超时时间需要大于它
+timeout = int(os.getenv('WEB_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# 定期重启worker，防止长时间运行的内存增长
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('WEB_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    server.log.info(f"worker {worker.pid} 已启动")
+
+
+def on_reload(server):
+    server.log.info("收到重载信号，平滑重启所有worker")
@@ -15,6 +15,11 @@ def check_health():
             if data.get('status') == 'healthy':
                 print("应用健康检查通过")
                 return True
+            if data.get('status') == 'degraded':
+                # 面板进程正常，MySQL/Redis暂不可用（后台重连中），不重启容器
+                down = [name for name, dep in data.get('dependencies', {}).items() if dep.get('state') == 'down']
+                print(f"应用运行中，依赖不可用: {', '.join(down)}")
+                return True
         
         print(f"健康检查失败: {response.status_code}")
         return False
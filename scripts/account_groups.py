@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号组汇总表 account_groups
+每个账号组（前缀）一行：所处阶段、该阶段的成员数、汇总的已用额度、激活时间、最后变化时间。
+阶段和成员数由 GroupStageSync 按账号池索引中成员变化的组增量写入（多个进程中只有一个负责写入），
+面板在激活/清理/上传后直接更新对应的组，已用额度由监控服务汇总写入；
+统计和待激活页面直接读取本表，不再从文件名重建账号组、逐次汇总额度。
+"""
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from scripts.account_scanner import GROUP_SIZE, POOL_DIRECTORIES
+
+logger = logging.getLogger(__name__)
+
+# 每条多行INSERT包含的最大行数
+WRITE_BATCH_SIZE = 500
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS account_groups (
+        prefix VARCHAR(255) PRIMARY KEY,
+        stage VARCHAR(50) NOT NULL,
+        member_count INT NOT NULL DEFAULT 0,
+        used_quota BIGINT DEFAULT 0,
+        activation_date TIMESTAMP NULL,
+        last_change TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_stage_quota (stage, used_quota)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+'''
+
+
+def group_stage(stage_counts):
+    """
+    由账号组在各阶段的文件数确定 (阶段, 成员数)
+    成员分散在多个阶段时取生命周期中最早的阶段，成员数为该阶段中的文件数
+    """
+    for stage in POOL_DIRECTORIES:
+        if stage_counts.get(stage):
+            return stage, stage_counts[stage]
+    return None, 0
+
+
+class AccountGroupTable:
+    """account_groups 表的读写，connect 为返回数据库连接的函数"""
+
+    def __init__(self, connect):
+        self.connect = connect
+
+    def ensure_table(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CREATE_TABLE_SQL)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def load(self):
+        """读取所有组，返回 前缀 -> (阶段, 成员数, 已用额度)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT prefix, stage, member_count, used_quota FROM account_groups")
+            return {prefix: (stage, member_count, used_quota or 0)
+                    for prefix, stage, member_count, used_quota in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+
+    def write(self, rows=(), stage_rows=(), deleted=()):
+        """
+        批量写入（同一事务）
+        Args:
+            rows: [(前缀, 阶段, 成员数, 已用额度)]，写入整行
+            stage_rows: [(前缀, 阶段, 成员数)]，只更新阶段和成员数，保留已用额度
+            deleted: 已不存在任何文件的前缀
+        """
+        rows, stage_rows, deleted = list(rows), list(stage_rows), list(deleted)
+        if not rows and not stage_rows and not deleted:
+            return
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            for i in range(0, len(rows), WRITE_BATCH_SIZE):
+                cursor.executemany('''
+                    INSERT INTO account_groups (prefix, stage, member_count, used_quota)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    stage = VALUES(stage),
+                    member_count = VALUES(member_count),
+                    used_quota = VALUES(used_quota)
+                ''', rows[i:i + WRITE_BATCH_SIZE])
+
+            self.write_stages(cursor, stage_rows)
+
+            for i in range(0, len(deleted), WRITE_BATCH_SIZE):
+                chunk = deleted[i:i + WRITE_BATCH_SIZE]
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(f"DELETE FROM account_groups WHERE prefix IN ({placeholders})", chunk)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def write_quotas(self, rows):
+        """
+        写入账号组已用额度（同一事务）
+        Args:
+            rows: [(前缀, 阶段, 成员数, 已用额度)]，已有的组只更新已用额度，不存在时按给定阶段插入
+        """
+        rows = list(rows)
+        if not rows:
+            return
+
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            for i in range(0, len(rows), WRITE_BATCH_SIZE):
+                cursor.executemany('''
+                    INSERT INTO account_groups (prefix, stage, member_count, used_quota)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    used_quota = VALUES(used_quota)
+                ''', rows[i:i + WRITE_BATCH_SIZE])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def write_stages(self, cursor, stage_rows):
+        """只更新阶段和成员数（使用调用方的游标，由调用方提交，便于和其他写入放在同一事务）"""
+        stage_rows = list(stage_rows)
+        for i in range(0, len(stage_rows), WRITE_BATCH_SIZE):
+            cursor.executemany('''
+                INSERT INTO account_groups (prefix, stage, member_count)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                stage = VALUES(stage),
+                member_count = VALUES(member_count)
+            ''', stage_rows[i:i + WRITE_BATCH_SIZE])
+
+    def set_activation_date(self, prefix, activation_date):
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE account_groups SET activation_date = %s WHERE prefix = %s",
+                (activation_date, prefix)
+            )
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def count_complete_by_stage(self, cursor):
+        """各阶段完整账号组数量（使用调用方的游标，dictionary=True）"""
+        cursor.execute('''
+            SELECT stage, COUNT(*) AS count FROM account_groups
+            WHERE member_count = %s GROUP BY stage
+        ''', (GROUP_SIZE,))
+        return {row['stage']: row['count'] for row in cursor.fetchall()}
+
+    def page_complete(self, stage, order_by, offset, limit):
+        """
+        分页读取某阶段的完整账号组
+        Args:
+            order_by: quota_desc / quota_asc / prefix
+        Returns:
+            (行列表, 总数)，行包含 prefix, used_quota, activation_date, last_change
+        """
+        order = {
+            'quota_desc': 'used_quota DESC, prefix',
+            'quota_asc': 'used_quota ASC, prefix',
+            'prefix': 'prefix'
+        }[order_by]
+
+        conn = self.connect()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(
+                "SELECT COUNT(*) AS total FROM account_groups WHERE stage = %s AND member_count = %s",
+                (stage, GROUP_SIZE)
+            )
+            total = cursor.fetchone()['total']
+            cursor.execute(f'''
+                SELECT prefix, used_quota, activation_date, last_change FROM account_groups
+                WHERE stage = %s AND member_count = %s
+                ORDER BY {order}
+                LIMIT %s OFFSET %s
+            ''', (stage, GROUP_SIZE, limit, offset))
+            return cursor.fetchall(), total
+        finally:
+            cursor.close()
+            conn.close()
+
+
+class GroupStageSync:
+    """
+    把账号池索引中成员发生变化的账号组（阶段、成员数）写入汇总表
+    面板的每个worker和监控服务都可以运行同步，但只有持有写入锁（文件锁，进程退出时自动释放）的
+    一个进程写入；其他进程只取出并丢弃变化，持有锁的进程退出后由下一个同步的进程接管
+    """
+
+    def __init__(self, table, pool_index, lock_path="logs/account_groups.lock", resync_seconds=3600):
+        """
+        Args:
+            table: AccountGroupTable
+            pool_index: AccountPoolIndex，提供变化的组和各阶段文件数
+            resync_seconds: 与汇总表完整核对的间隔，纠正其他途径写入造成的偏差
+        """
+        self.table = table
+        self.pool_index = pool_index
+        self.lock_path = Path(lock_path)
+        self.resync_seconds = resync_seconds
+        self._lock_file = None
+        self._mutex = threading.Lock()
+        # 已写入的 前缀 -> (阶段, 成员数)，为None时下次同步完整核对
+        self._written = None
+        self._resynced_at = 0
+
+    @property
+    def owner(self):
+        return self._lock_file is not None
+
+    def _try_own(self):
+        if self._lock_file is not None:
+            return True
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"本进程 (pid {os.getpid()}) 负责写入账号组汇总表")
+        return True
+
+    def sync(self):
+        """
+        写入变化的组
+        Returns:
+            (写入组数, 删除组数)；本进程不负责写入时返回None
+        """
+        with self._mutex:
+            changed = self.pool_index.drain_changed()
+            if not self._try_own():
+                return None
+
+            if self._written is None or time.time() - self._resynced_at >= self.resync_seconds:
+                self._written = {prefix: row[:2] for prefix, row in self.table.load().items()}
+                self._resynced_at = time.time()
+                counts = self.pool_index.stage_counts()
+                changed = counts.keys() | self._written.keys()
+            elif changed:
+                counts = self.pool_index.stage_counts(changed)
+            else:
+                return 0, 0
+
+            stage_rows = []
+            deleted = []
+            for prefix in changed:
+                if prefix in counts:
+                    row = group_stage(counts[prefix])
+                    if self._written.get(prefix) != row:
+                        stage_rows.append((prefix, *row))
+                elif prefix in self._written:
+                    deleted.append(prefix)
+
+            try:
+                self.table.write(stage_rows=stage_rows, deleted=deleted)
+            except Exception:
+                # 本次变化已取出，下次同步时完整核对
+                self._written = None
+                raise
+
+            for prefix, stage, member_count in stage_rows:
+                self._written[prefix] = (stage, member_count)
+            for prefix in deleted:
+                self._written.pop(prefix, None)
+            return len(stage_rows), len(deleted)
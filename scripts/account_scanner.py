@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号目录扫描
+用 os.scandir 一次遍历目录（文件类型来自目录项，需要时顺带取大小和修改时间），
+按统一的文件名规则把账号文件归入账号组：{前缀}-{序号}[-actived|-used].json，前缀至少3段。
+面板、监控、上传脚本和辅助工具都通过这里解析账号组。
+"""
+
+import os
+import re
+from pathlib import Path
+
+POOL_DIRECTORIES = ["fresh", "uploaded", "exhausted_300", "activated", "exhausted_100", "archive"]
+
+# 完整账号组的成员数
+GROUP_SIZE = 3
+
+# 文件名(不含扩展名) -> 前缀、序号；-actived（已激活）和 -used（已归档）后缀不属于序号
+GROUP_NAME_RE = re.compile(
+    r'^(?P<prefix>[^-]+(?:-[^-]+){2,}?)-(?!(?:actived|used)$)(?P<number>[^-]+)(?:-actived|-used)?$'
+)
+
+
+def parse_group_prefix(stem):
+    """从文件名(不含扩展名)解析账号组前缀，不符合命名规范时返回None"""
+    match = GROUP_NAME_RE.match(stem)
+    return match.group('prefix') if match else None
+
+
+class GroupScan:
+    """一个目录的扫描结果"""
+
+    __slots__ = ('path', 'files', 'groups', 'unmatched')
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.files = {}      # 文件名 -> (大小, 修改时间)，未取stat时为 (None, None)
+        self.groups = {}     # 前缀 -> 文件名列表
+        self.unmatched = []  # 不符合命名规范的JSON文件
+
+    def complete(self, size=GROUP_SIZE):
+        """完整账号组：前缀 -> 按序号排序的文件名列表"""
+        return {prefix: sorted(names) for prefix, names in self.groups.items() if len(names) == size}
+
+    def incomplete(self, size=GROUP_SIZE):
+        return {prefix: sorted(names) for prefix, names in self.groups.items() if len(names) != size}
+
+    def paths(self, names):
+        return [self.path / name for name in names]
+
+    @property
+    def total_size(self):
+        return sum(size or 0 for size, _ in self.files.values())
+
+
+def scan_directory(path, with_stat=False):
+    """
+    扫描一个目录中的账号文件，目录不存在时返回None
+    Args:
+        with_stat: 同时记录文件大小和修改时间
+    """
+    scan = GroupScan(path)
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith('.json') or not entry.is_file():
+                    continue
+                if with_stat:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    scan.files[name] = (stat.st_size, stat.st_mtime)
+                else:
+                    scan.files[name] = (None, None)
+
+                match = GROUP_NAME_RE.match(name[:-len('.json')])
+                if match:
+                    scan.groups.setdefault(match.group('prefix'), []).append(name)
+                else:
+                    scan.unmatched.append(name)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return scan
+
+
+def scan_tree(base_dir, directories=POOL_DIRECTORIES, with_stat=False):
+    """扫描所有阶段目录，返回 目录 -> GroupScan（不存在的目录不包含在结果中）"""
+    scans = {}
+    for directory in directories:
+        scan = scan_directory(Path(base_dir) / directory, with_stat)
+        if scan is not None:
+            scans[directory] = scan
+    return scans
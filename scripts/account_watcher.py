@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号目录生命周期监听
+基于watchdog（Linux下使用inotify），inotify不可用时回退为轮询，
+把 accounts/ 下各阶段目录中的文件创建、移动、删除转换为结构化的生命周期事件，
+供账号池索引、统计、缓存等订阅者增量更新，避免在热路径上扫描目录。
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers.polling import PollingObserver
+    try:
+        from watchdog.observers.inotify import InotifyObserver
+    except ImportError:
+        InotifyObserver = None
+except ImportError:
+    FileSystemEventHandler = object
+    PollingObserver = None
+    InotifyObserver = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.account_scanner import POOL_DIRECTORIES, parse_group_prefix
+
+logger = logging.getLogger(__name__)
+
+
+class LifecycleEvent:
+    """
+    账号文件生命周期事件
+    action: created / moved / deleted / modified
+    source_stage/source_name: 事件前文件所在阶段目录和文件名（created时为None）
+    target_stage/filename: 事件后文件所在阶段目录和文件名（deleted时target_stage为None）
+    """
+
+    __slots__ = ('action', 'filename', 'prefix', 'source_stage', 'source_name', 'target_stage', 'timestamp')
+
+    def __init__(self, action, filename, source_stage=None, source_name=None, target_stage=None):
+        self.action = action
+        self.filename = filename
+        self.prefix = parse_group_prefix(filename[:-len('.json')])
+        self.source_stage = source_stage
+        self.source_name = source_name
+        self.target_stage = target_stage
+        self.timestamp = time.time()
+
+    def to_dict(self):
+        return {
+            'action': self.action,
+            'filename': self.filename,
+            'prefix': self.prefix,
+            'source_stage': self.source_stage,
+            'source_name': self.source_name,
+            'target_stage': self.target_stage,
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat()
+        }
+
+    def __repr__(self):
+        return f"LifecycleEvent({self.action} {self.source_stage}/{self.source_name} -> {self.target_stage}/{self.filename})"
+
+
+class _LifecycleHandler(FileSystemEventHandler):
+    """把watchdog原始事件转换为生命周期事件"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher._dispatch_created(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            location = self.watcher._locate(event.src_path)
+            if location:
+                self.watcher._emit(LifecycleEvent('modified', location[1], target_stage=location[0]))
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher._dispatch_deleted(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher._dispatch_moved(event.src_path, event.dest_path)
+
+
+class AccountWatcher:
+    """accounts/ 目录生命周期监听器"""
+
+    def __init__(self, base_dir="accounts", force_polling=False, poll_interval=5):
+        self.base_dir = Path(base_dir).resolve()
+        self.force_polling = force_polling
+        self.poll_interval = poll_interval
+        self.mode = None
+        self._observer = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """订阅生命周期事件，回调在监听线程中按事件顺序调用"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    @property
+    def running(self):
+        return self._observer is not None and self._observer.is_alive()
+
+    def start(self):
+        """启动监听，优先使用inotify，失败时回退为轮询；watchdog不可用时返回False"""
+        if PollingObserver is None:
+            logger.warning("watchdog未安装，账号目录监听不可用")
+            return False
+
+        for directory in POOL_DIRECTORIES:
+            (self.base_dir / directory).mkdir(parents=True, exist_ok=True)
+
+        if InotifyObserver is not None and not self.force_polling:
+            try:
+                self._observer = self._start_observer(InotifyObserver())
+                self.mode = 'inotify'
+            except OSError as e:
+                # 常见原因: inotify watch数量达到上限
+                logger.warning(f"inotify初始化失败，回退为轮询模式: {e}")
+                self._observer = None
+
+        if self._observer is None:
+            self._observer = self._start_observer(PollingObserver(timeout=self.poll_interval))
+            self.mode = 'polling'
+
+        logger.info(f"账号目录监听已启动: {self.base_dir} (模式: {self.mode})")
+        return True
+
+    def _start_observer(self, observer):
+        observer.schedule(_LifecycleHandler(self), str(self.base_dir), recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def stop(self):
+        """停止监听"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+            self.mode = None
+
+    def _locate(self, path):
+        """把绝对路径映射为(阶段目录, 文件名)，不属于账号文件时返回None"""
+        try:
+            relative = Path(os.fsdecode(path)).resolve().relative_to(self.base_dir)
+        except ValueError:
+            return None
+
+        if len(relative.parts) != 2 or relative.parts[0] not in POOL_DIRECTORIES:
+            return None
+        if not relative.name.endswith('.json'):
+            return None
+        return relative.parts[0], relative.name
+
+    def _dispatch_created(self, path):
+        location = self._locate(path)
+        if location:
+            self._emit(LifecycleEvent('created', location[1], target_stage=location[0]))
+
+    def _dispatch_deleted(self, path):
+        location = self._locate(path)
+        if location:
+            self._emit(LifecycleEvent('deleted', location[1], source_stage=location[0], source_name=location[1]))
+
+    def _dispatch_moved(self, src_path, dest_path):
+        source = self._locate(src_path)
+        target = self._locate(dest_path)
+
+        if source and target:
+            self._emit(LifecycleEvent('moved', target[1], source_stage=source[0], source_name=source[1],
+                                      target_stage=target[0]))
+        elif target:
+            # 从受监听目录之外移入
+            self._emit(LifecycleEvent('created', target[1], target_stage=target[0]))
+        elif source:
+            # 移出到受监听目录之外
+            self._emit(LifecycleEvent('deleted', source[1], source_stage=source[0], source_name=source[1]))
+
+    def _emit(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"生命周期事件处理失败 {event}: {e}")
+
+
+def main():
+    """以JSON行输出生命周期事件，便于排查各进程的文件移动"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='监听账号目录生命周期事件')
+    parser.add_argument('--base-dir', default='accounts', help='账号目录 (默认: accounts)')
+    parser.add_argument('--polling', action='store_true', help='强制使用轮询模式')
+    parser.add_argument('--interval', type=float, default=5, help='轮询间隔秒数 (默认: 5)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    watcher = AccountWatcher(args.base_dir, force_polling=args.polling, poll_interval=args.interval)
+    watcher.subscribe(lambda event: print(json.dumps(event.to_dict(), ensure_ascii=False), flush=True))
+    if not watcher.start():
+        sys.exit(1)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步批量上传引擎
+基于httpx.AsyncClient，限制同时进行的请求数并按主机限速，
+同一账号组的3个文件一起上传，结果随完成顺序逐个回调
+"""
+
+import asyncio
+import logging
+import time
+from urllib.parse import urlparse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from scripts.new_api_client import RETRY_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+
+class HostRateLimiter:
+    """按主机的令牌桶限速器"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1, rate))
+        self._buckets = {}  # 主机 -> [令牌数, 上次补充时间]
+        self._locks = {}
+
+    async def acquire(self, host):
+        """获取一个令牌，令牌不足时等待"""
+        if self.rate <= 0:
+            return
+
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            bucket = self._buckets.setdefault(host, [self.burst, time.monotonic()])
+            while True:
+                now = time.monotonic()
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    return
+                await asyncio.sleep((1 - bucket[0]) / self.rate)
+
+
+class AsyncUploadEngine:
+    """异步上传引擎，复用BatchUploader的校验、payload构建和共享客户端的重试/耗时配置"""
+
+    def __init__(self, uploader, max_in_flight=20, rate_per_host=10, pack=False):
+        self.uploader = uploader
+        self.pack = pack
+        self.client = uploader.client
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        self.host = urlparse(uploader.api_url).netloc
+
+    async def upload_file(self, http, semaphore, file_path):
+        """上传单个文件，返回 (name, file_path, success, message)"""
+        name = file_path.stem
+        payload, error_msg = self.uploader.prepare_channel(file_path)
+        if payload is None:
+            return (name, file_path, False, error_msg)
+
+        success, message = await self.post_channel(http, semaphore, name, payload)
+        return (name, file_path, success, message)
+
+    async def upload_packed(self, http, semaphore, project, files):
+        """把账号组打包上传为一个多密钥渠道，返回 (渠道名, 组内每个文件的结果)"""
+        try:
+            channel_name, payload = self.uploader.prepare_packed_group(project, files)
+        except (ValueError, OSError) as e:
+            return None, [(f.stem, f, False, f"打包失败: {str(e)}") for f in files]
+
+        success, message = await self.post_channel(http, semaphore, channel_name, payload)
+        if success:
+            logger.info(f"[打包] {project} -> 多密钥渠道 {channel_name}（{len(files)} 个密钥）")
+        return channel_name, [(f.stem, f, success, message) for f in files]
+
+    async def post_channel(self, http, semaphore, name, payload):
+        """提交创建渠道请求（限速、重试），返回 (是否成功, 失败原因)"""
+        for attempt in range(1, self.client.max_attempts + 1):
+            await self.rate_limiter.acquire(self.host)
+            try:
+                async with semaphore:
+                    # 从拿到并发名额开始计时，排队等待 max_in_flight 的时间不计入New API耗时
+                    start = time.monotonic()
+                    response = await http.post(self.uploader.api_url, json=payload)
+            except httpx.TimeoutException:
+                self.client.record_latency('POST', self.uploader.api_url, time.monotonic() - start, error=True)
+                reason = "请求超时"
+            except httpx.HTTPError as e:
+                self.client.record_latency('POST', self.uploader.api_url, time.monotonic() - start, error=True)
+                reason = f"网络异常: {str(e)}"
+            else:
+                status_code = response.status_code
+                self.client.record_latency('POST', self.uploader.api_url, time.monotonic() - start,
+                                           error=status_code != 200)
+                if status_code == 200:
+                    try:
+                        result = response.json()
+                    except ValueError as e:
+                        return False, f"异常: {str(e)}"
+                    # 有些API成功时不返回success字段
+                    if result.get('success', True):
+                        return True, ""
+                    return False, f"API返回失败: {result.get('message', '未知错误')}"
+
+                reason = f"状态码 {status_code}，返回: {response.text}"
+                if status_code not in RETRY_STATUS_CODES:
+                    return False, reason
+
+            if attempt >= self.client.max_attempts:
+                return False, reason
+
+            delay = self.client.backoff_delay(attempt)
+            logger.warning(f"[重试] {name} 第{attempt}次失败（{reason}），{delay:.2f}秒后重试...")
+            await asyncio.sleep(delay)
+
+    async def upload_group(self, http, semaphore, project, files, on_result, committer=None):
+        """
+        同时上传一个账号组的全部文件（打包模式下为一个多密钥渠道）
+        普通模式每个文件完成时回调；事务模式和打包模式在整组完成后按最终结果回调
+        """
+        if committer is not None:
+            await asyncio.to_thread(committer.begin, project, files)
+
+        if self.pack:
+            channel_name, results = await self.upload_packed(http, semaphore, project, files)
+            if committer is not None:
+                if results[0][2]:
+                    await asyncio.to_thread(committer.created, project, channel_name)
+                results = await asyncio.to_thread(committer.finish, project, files, results)
+            for result in results:
+                on_result(result)
+            return results
+
+        async def upload_and_report(file_path):
+            result = await self.upload_file(http, semaphore, file_path)
+            if committer is None:
+                on_result(result)
+            elif result[2]:
+                await asyncio.to_thread(committer.created, project, result[0])
+            return result
+
+        results = await asyncio.gather(*(upload_and_report(file_path) for file_path in files))
+        if committer is not None:
+            results = await asyncio.to_thread(committer.finish, project, files, results)
+            for result in results:
+                on_result(result)
+        return results
+
+    async def _run(self, groups, on_result, committer):
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+
+        async with httpx.AsyncClient(headers=dict(self.client.session.headers), limits=limits,
+                                     timeout=self.client.upload_timeout) as http:
+            group_results = await asyncio.gather(
+                *(self.upload_group(http, semaphore, project, files, on_result, committer)
+                  for project, files in groups.items())
+            )
+        return [result for results in group_results for result in results]
+
+    def upload(self, groups, on_result, committer=None):
+        """
+        上传多个账号组
+        Args:
+            groups: 项目前缀 -> 账号组文件列表
+            on_result: 每个文件得到结果时调用，参数为 (name, file_path, success, message)
+            committer: 账号组事务（GroupCommitter），为None时不做整组提交/回滚
+        """
+        return asyncio.run(self._run(groups, on_result, committer))
@@ -3,6 +3,7 @@
 """
 批量上传脚本 - 基于用户原始代码改进，使用最新API格式
 功能：从账号池中选择并上传JSON文件到New API
+既可作为命令行脚本运行，也可在进程内调用 BatchUploader.run_upload（返回 UploadResult）
 """
 
 import json
@@ -12,30 +13,151 @@ import time
 import sys
 import argparse
 import random
-import re
 import shutil
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
-# 配置日志
+# 允许以 python scripts/batch_upload.py 方式直接运行
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.account_scanner import scan_directory
+from scripts.async_uploader import AsyncUploadEngine, httpx
+from scripts.key_material import get_key_cache
+from scripts.new_api_client import NewAPIError, get_shared_client, packed_channel_name
+from scripts.upload_journal import UploadJournal
+
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/batch_upload.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+
+class UploadConfigError(Exception):
+    """上传配置不完整（如未设置API令牌）"""
+
+
+class UploadResult:
+    """一次批量上传的结果"""
+
+    __slots__ = ('source_dir', 'requested', 'selected', 'results', 'moved', 'failed_moves',
+                 'started_at', 'duration_seconds', 'error')
+
+    def __init__(self, source_dir, requested):
+        self.source_dir = source_dir
+        self.requested = requested
+        self.selected = []
+        self.results = []  # [(渠道名, 文件路径, 是否成功, 失败原因)]
+        self.moved = []
+        self.failed_moves = []
+        self.started_at = time.time()
+        self.duration_seconds = 0.0
+        self.error = None
+
+    @property
+    def succeeded(self):
+        return [name for name, _, success, _ in self.results if success]
+
+    @property
+    def failed(self):
+        return [(name, message) for name, _, success, message in self.results if not success]
+
+    @property
+    def success(self):
+        """至少上传成功一个文件"""
+        return any(success for _, _, success, _ in self.results)
+
+    def to_dict(self):
+        return {
+            'source_dir': self.source_dir,
+            'requested': self.requested,
+            'selected': [f.name for f in self.selected],
+            'succeeded': len(self.succeeded),
+            'failed': len(self.failed),
+            'files': [
+                {'file': Path(file_path).name, 'success': success, 'message': message}
+                for _, file_path, success, message in self.results
+            ],
+            'moved': [f.name for f in self.moved],
+            'failed_moves': [{'file': f.name, 'message': reason} for f, reason in self.failed_moves],
+            'started_at': self.started_at,
+            'duration_seconds': round(self.duration_seconds, 3),
+            'error': self.error
+        }
+
+
+class GroupCommitter:
+    """
+    账号组上传事务：组内渠道全部创建成功后才移动文件，
+    否则通过API删除已创建的渠道；过程记录在事务日志中，崩溃后可恢复
+    """
+    
+    def __init__(self, uploader, source_dir):
+        self.uploader = uploader
+        self.journal = uploader.journal
+        self.source_dir = source_dir
+        self.moved_files = []
+        self.failed_move_files = []
+        self._lock = threading.Lock()
+    
+    def begin(self, project, files):
+        """开始一个账号组事务"""
+        self.journal.begin(project, self.source_dir, files)
+    
+    def created(self, project, name):
+        """记录组内一个已创建的渠道"""
+        self.journal.record_created(project, name)
+    
+    def finish(self, project, files, results):
+        """
+        提交或回滚账号组事务，返回组内每个文件的最终结果
+        results 中缺少的文件视为未上传
+        """
+        uploaded = [name for name, _, success, _ in results if success]
+        
+        if len(uploaded) == len(files):
+            self.journal.set_state(project, 'committed')
+            moved, failed_moves = self.uploader.move_uploaded_files(files)
+            with self._lock:
+                self.moved_files.extend(moved)
+                self.failed_move_files.extend(failed_moves)
+            if not failed_moves:
+                self.journal.finish(project)
+            return results
+        
+        logger.warning(f"[回滚] 账号组 {project} 只成功创建 {len(uploaded)}/{len(files)} 个渠道，删除已创建的渠道...")
+        if self.uploader.rollback_channels(uploaded):
+            self.journal.finish(project)
+            rollback_message = "同组其他文件上传失败，已回滚"
+        else:
+            self.journal.set_state(project, 'rollback_failed')
+            rollback_message = "同组其他文件上传失败，回滚未完成（下次启动时重试）"
+        
+        by_name = {result[0]: result for result in results}
+        final_results = []
+        for file_path in files:
+            result = by_name.get(file_path.stem)
+            if result is None:
+                final_results.append((file_path.stem, file_path, False, "同组其他文件上传失败，未上传"))
+            elif result[2]:
+                final_results.append((file_path.stem, file_path, False, rollback_message))
+            else:
+                final_results.append(result)
+        return final_results
+
+
 class BatchUploader:
     """批量上传管理类"""
     
-    def __init__(self, config_path="config/settings.json"):
-        self.load_config(config_path)
+    def __init__(self, config_path="config/settings.json", api_config=None):
+        """
+        Args:
+            api_config: 直接传入new_api配置（进程内调用时与调用方共用同一个共享客户端），为None时从配置文件读取
+        """
+        self.load_config(config_path, api_config)
         self.base_dir = Path("accounts")
+        self.journal = UploadJournal()
+        # 密钥文件只读取解析一次，重试、回滚后再次上传都复用缓存的内容
+        self.key_cache = get_key_cache()
         
         # 使用最新版本的固定配置模板
         self.channel_template = {
@@ -56,33 +178,34 @@ class BatchUploader:
             "setting": "{\"force_format\":false,\"thinking_to_content\":false,\"proxy\":\"\",\"pass_through_body_enabled\":false,\"system_prompt\":\"\"}",  # 新增设置字段
             "group": "default,svip,vip,vertex"
         }
-        
-        self.max_retries = 3  # 最大重试次数
     
-    def load_config(self, config_path):
-        """加载配置"""
-        if Path(config_path).exists():
+    def load_config(self, config_path, api_config=None):
+        """加载配置，缺少API令牌时抛出 UploadConfigError"""
+        if api_config is None and Path(config_path).exists():
             with open(config_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
             
-            self.api_url = config['new_api']['base_url'] + config['new_api']['upload_endpoint']
-            self.api_token = config['new_api']['api_key']
-        else:
+            api_config = config['new_api']
+        elif api_config is None:
             # 从环境变量获取
-            base_url = os.getenv('NEW_API_BASE_URL', 'http://152.53.166.175:3058')
-            self.api_url = base_url + '/api/channel/'
-            self.api_token = os.getenv('NEW_API_TOKEN', '')
-        
-        # 设置请求头
-        self.headers = {
-            "Authorization": f"Bearer {self.api_token}",
-            "Content-Type": "application/json",
-            "New-API-User": "1"
-        }
+            api_config = {
+                "base_url": os.getenv('NEW_API_BASE_URL', 'http://152.53.166.175:3058'),
+                "upload_endpoint": '/api/channel/',
+                "api_key": os.getenv('NEW_API_TOKEN', ''),
+                "pool_size": int(os.getenv('NEW_API_POOL_SIZE', 10)),
+                "multi_key_packing": os.getenv('NEW_API_MULTI_KEY', 'false').lower() == 'true'
+            }
+        
+        self.api_url = api_config['base_url'] + api_config.get('upload_endpoint', '/api/channel/')
+        self.api_token = api_config['api_key']
+        # 整组打包为一个多密钥渠道上传
+        self.pack_groups = api_config.get('multi_key_packing', False)
         
         if not self.api_token:
-            logger.error("请设置 NEW_API_TOKEN")
-            sys.exit(1)
+            raise UploadConfigError("请设置 NEW_API_TOKEN")
+        
+        # 进程内共享的连接池客户端，认证头只构建一次
+        self.client = get_shared_client(api_config)
     
     def parse_arguments(self):
         """解析命令行参数"""
@@ -91,6 +214,16 @@ class BatchUploader:
                             help='要上传的文件数量（必须是3的倍数，默认为3）')
         parser.add_argument('--source', default='fresh',
                             help='源目录名称，默认为fresh')
+        parser.add_argument('--async', dest='use_async', action='store_true',
+                            help='使用异步上传引擎（httpx），适合一次补充大量账号组')
+        parser.add_argument('--max-in-flight', type=int, default=20,
+                            help='异步模式下同时进行的最大请求数，默认为20')
+        parser.add_argument('--rate', type=float, default=10,
+                            help='异步模式下每个主机每秒最多请求数，0为不限速，默认为10')
+        parser.add_argument('--atomic', action='store_true',
+                            help='按账号组事务上传：组内3个渠道全部创建成功才移动文件，否则删除已创建的渠道')
+        parser.add_argument('--pack', action='store_true',
+                            help='把每个账号组的3个密钥打包上传为一个多密钥渠道（默认取配置 multi_key_packing）')
         args = parser.parse_args()
         
         # 检查数量是否为3的倍数
@@ -102,7 +235,7 @@ class BatchUploader:
             logger.error(f"上传数量必须大于0，你输入的是 {args.upload_count}")
             sys.exit(1)
         
-        return args.upload_count, args.source
+        return args
     
     def get_project_groups(self, source_dir):
         """获取指定目录内所有JSON文件并按项目分组"""
@@ -117,45 +250,27 @@ class BatchUploader:
             logger.error(f"{json_folder} 不是一个目录！")
             return {}
         
-        # 获取目录内的JSON文件
+        # 扫描目录内的JSON文件并按项目分组，例如：proj-roble-vip-01.json / proj-roble-vip-01-actived.json -> proj-roble-vip
         try:
-            json_files = [f for f in json_folder.iterdir() if f.suffix == '.json']
+            scan = scan_directory(json_folder)
         except Exception as e:
             logger.error(f"无法读取 {json_folder} 目录：{e}")
             return {}
         
-        if not json_files:
+        if not scan.files:
             logger.error(f"在 {json_folder} 目录内没有找到任何JSON文件！")
             return {}
         
-        logger.info(f"在 {json_folder} 目录内找到 {len(json_files)} 个JSON文件")
-        
-        # 按项目分组
-        groups = {}
-        
-        for file in json_files:
-            # 匹配文件名模式，例如：proj-roble-vip-01.json
-            # 提取项目前缀（去掉最后的数字部分）
-            match = re.match(r'(.+)-(\d+)\.json', file.name)
-            if match:
-                project_prefix = match.group(1)  # 例如：proj-roble-vip
-                number = match.group(2)          # 例如：01
-                
-                if project_prefix not in groups:
-                    groups[project_prefix] = []
-                groups[project_prefix].append(file)
-            else:
-                logger.warning(f"文件 {file.name} 不符合命名规范，跳过")
+        logger.info(f"在 {json_folder} 目录内找到 {len(scan.files)} 个JSON文件")
+        
+        for name in scan.unmatched:
+            logger.warning(f"文件 {name} 不符合命名规范，跳过")
         
         # 只保留完整的组（包含3个文件的组）
-        complete_groups = {}
-        for project, files in groups.items():
-            if len(files) == 3:
-                complete_groups[project] = sorted(files)  # 排序确保顺序一致
-            else:
-                logger.warning(f"项目 {project} 只有 {len(files)} 个文件，需要3个文件才能构成完整组，跳过")
+        for project, names in scan.incomplete().items():
+            logger.warning(f"项目 {project} 只有 {len(names)} 个文件，需要3个文件才能构成完整组，跳过")
         
-        return complete_groups
+        return {project: scan.paths(names) for project, names in scan.complete().items()}
     
     def select_upload_groups(self, groups, upload_count, prefer_activated=True):
         """选择要上传的项目组"""
@@ -201,10 +316,11 @@ class BatchUploader:
         return selected_files
     
     def escape_json_content(self, file_path):
-        """转义JSON文件内容"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return json.dumps(json.loads(content))  # 标准JSON转义
+        """转义JSON文件内容（标准JSON序列化，来自密钥缓存）"""
+        material = self.key_cache.get(file_path)
+        if material.json_error:
+            raise ValueError(material.json_error)
+        return material.payload
     
     def create_new_format_payload(self, name, key_content):
         """创建新版本格式的payload"""
@@ -220,66 +336,97 @@ class BatchUploader:
         
         return payload
     
+    def create_packed_payload(self, channel_name, keys):
+        """创建多密钥渠道的payload：组内密钥以JSON数组提交，按模板的multi_key_mode轮换使用"""
+        channel_config = self.channel_template.copy()
+        channel_config["name"] = channel_name
+        channel_config["key"] = json.dumps(keys)
+        
+        payload = {
+            "mode": "multi_to_single",
+            "multi_key_mode": channel_config["multi_key_mode"],
+            "channel": channel_config
+        }
+        
+        return payload
+    
+    def prepare_packed_group(self, project, files):
+        """
+        校验账号组并构建多密钥渠道payload，返回 (渠道名, payload)
+        密钥顺序即文件序号（{前缀}-01..03），监控按此顺序把密钥状态还原为账号；不满足时抛出ValueError
+        """
+        activated = ['-actived' in f.stem for f in files]
+        if any(activated) and not all(activated):
+            raise ValueError("组内同时有已激活和未激活的文件")
+        
+        keys = []
+        for index, file_path in enumerate(files, 1):
+            stem = file_path.stem[:-len('-actived')] if activated[0] else file_path.stem
+            if stem != f"{project}-{index:02d}":
+                raise ValueError(f"文件 {file_path.name} 不符合 {project}-{index:02d} 的序号规则")
+            material = self.key_cache.get(file_path)
+            if material.json_error:
+                raise ValueError(f"文件 {file_path.name} {material.json_error}")
+            keys.append(material.data)
+        
+        channel_name = packed_channel_name(project, activated[0])
+        return channel_name, self.create_packed_payload(channel_name, keys)
+    
     def validate_json_file(self, file_path):
         """验证JSON文件格式是否正确"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json.load(f)
-            return True, ""
-        except json.JSONDecodeError as e:
-            return False, f"JSON格式错误: {str(e)}"
+            material = self.key_cache.get(file_path)
         except Exception as e:
             return False, f"文件读取错误: {str(e)}"
+        if material.json_error:
+            return False, material.json_error
+        return True, ""
+    
+    def prepare_channel(self, file_path):
+        """读取（或从缓存取得）密钥并构建单渠道payload，返回 (payload, 失败原因)"""
+        try:
+            material = self.key_cache.get(file_path)
+        except Exception as e:
+            return None, f"JSON验证失败: 文件读取错误: {str(e)}"
+        if material.json_error:
+            return None, f"JSON验证失败: {material.json_error}"
+        return self.create_new_format_payload(file_path.stem, material.payload), ""
     
     def upload_channel(self, file_path):
         """上传单个频道文件"""
         name = file_path.stem
+        payload, error_msg = self.prepare_channel(file_path)
+        if payload is None:
+            return (name, file_path, False, error_msg)
         
-        # 首先验证JSON文件
-        is_valid, error_msg = self.validate_json_file(file_path)
-        if not is_valid:
-            return (name, file_path, False, f"JSON验证失败: {error_msg}")
+        success, message = self.create_channel(payload)
+        return (name, file_path, success, message)
+    
+    def upload_packed_group(self, project, files):
+        """把账号组打包上传为一个多密钥渠道，返回组内每个文件的结果（同成同败）"""
+        try:
+            channel_name, payload = self.prepare_packed_group(project, files)
+        except (ValueError, OSError) as e:
+            return [(f.stem, f, False, f"打包失败: {str(e)}") for f in files]
         
+        success, message = self.create_channel(payload)
+        if success:
+            logger.info(f"[打包] {project} -> 多密钥渠道 {channel_name}（{len(files)} 个密钥）")
+        return [(f.stem, f, success, message) for f in files]
+    
+    def create_channel(self, payload):
+        """创建渠道，返回 (是否成功, 失败原因)；重试（指数退避+抖动）由共享客户端处理"""
         try:
-            key_content = self.escape_json_content(file_path)
-            payload = self.create_new_format_payload(name, key_content)
-
-            for attempt in range(1, self.max_retries + 1):
-                try:
-                    response = requests.post(self.api_url, headers=self.headers, json=payload, timeout=15)
-                    if response.status_code == 200:
-                        result = response.json()
-                        # 检查返回结果是否包含成功信息
-                        if result.get('success', True):  # 有些API成功时不返回success字段
-                            return (name, file_path, True, "")
-                        else:
-                            return (name, file_path, False, f"API返回失败: {result.get('message', '未知错误')}")
-                    else:
-                        if attempt < self.max_retries:
-                            logger.warning(f"[重试] {name} 第{attempt}次失败，状态码{response.status_code}，准备重试...")
-                            time.sleep(1)
-                        else:
-                            return (name, file_path, False, f"状态码 {response.status_code}，返回: {response.text}")
-                except requests.exceptions.Timeout:
-                    if attempt < self.max_retries:
-                        logger.warning(f"[重试] {name} 第{attempt}次超时，准备重试...")
-                        time.sleep(2)
-                    else:
-                        return (name, file_path, False, "请求超时")
-                except requests.exceptions.RequestException as e:
-                    if attempt < self.max_retries:
-                        logger.warning(f"[重试] {name} 第{attempt}次网络异常 {e}，准备重试...")
-                        time.sleep(1)
-                    else:
-                        return (name, file_path, False, f"网络异常: {str(e)}")
-                except Exception as e:
-                    if attempt < self.max_retries:
-                        logger.warning(f"[重试] {name} 第{attempt}次异常 {e}，准备重试...")
-                        time.sleep(1)
-                    else:
-                        return (name, file_path, False, f"异常: {str(e)}")
+            self.client.create_channel(payload)
+            return True, ""
+        except NewAPIError as e:
+            return False, str(e)
+        except requests.exceptions.Timeout:
+            return False, "请求超时"
+        except requests.exceptions.RequestException as e:
+            return False, f"网络异常: {str(e)}"
         except Exception as e:
-            return (name, file_path, False, f"解析或准备上传异常: {str(e)}")
+            return False, f"异常: {str(e)}"
     
     def move_uploaded_files(self, success_files, target_dir="uploaded"):
         """移动上传成功的文件到目标目录"""
@@ -293,6 +440,7 @@ class BatchUploader:
             try:
                 destination = target_path / file_path.name
                 shutil.move(str(file_path), str(destination))
+                self.key_cache.rename(file_path, destination)
                 moved_files.append(destination)
                 logger.info(f"[移动成功] {file_path.name} -> {target_dir}/")
             except Exception as e:
@@ -301,8 +449,111 @@ class BatchUploader:
         
         return moved_files, failed_move_files
     
-    def run_upload(self, upload_count, source_dir):
-        """执行上传任务"""
+    def upload_group(self, project, files, committer=None, pack=False):
+        """上传一个账号组，返回组内每个文件的结果"""
+        if committer is not None:
+            return self.upload_group_atomic(project, files, committer, pack)
+        if pack:
+            return self.upload_packed_group(project, files)
+        return [self.upload_channel(file_path) for file_path in files]
+    
+    def upload_group_atomic(self, project, files, committer, pack=False):
+        """按事务上传一个账号组：依次创建渠道，遇到失败立即停止并回滚"""
+        committer.begin(project, files)
+        if pack:
+            # 多密钥渠道一次创建，本身同成同败
+            results = self.upload_packed_group(project, files)
+            if results[0][2]:
+                committer.created(project, packed_channel_name(project, '-actived' in files[0].stem))
+            return committer.finish(project, files, results)
+        
+        results = []
+        for file_path in files:
+            result = self.upload_channel(file_path)
+            results.append(result)
+            if not result[2]:
+                break
+            committer.created(project, result[0])
+        return committer.finish(project, files, results)
+    
+    def rollback_channels(self, channel_names):
+        """按名称删除已创建的渠道，全部成功时返回True"""
+        all_deleted = True
+        for name in channel_names:
+            try:
+                channel_ids = self.client.find_channel_ids(name)
+                for channel_id in channel_ids:
+                    self.client.delete_channel(channel_id)
+                    logger.info(f"[回滚] 已删除渠道 {name} (ID:{channel_id})")
+            except Exception as e:
+                all_deleted = False
+                logger.error(f"[回滚失败] {name}，原因：{e}")
+        return all_deleted
+    
+    def recover_pending_groups(self):
+        """
+        处理上次崩溃遗留的账号组事务：已提交的补完文件移动，其余回滚
+        其他进程正在上传时跳过（其事务日志可能属于进行中的上传），下次上传前再处理
+        """
+        with self.journal.recovering() as exclusive:
+            if not exclusive:
+                logger.info("[恢复] 其他进程正在上传，跳过遗留事务的处理")
+                return
+            self._recover_pending_groups()
+    
+    def _recover_pending_groups(self):
+        for entry in self.journal.pending():
+            project = entry['prefix']
+            source_path = self.base_dir / entry['source_dir']
+            
+            if entry['state'] == 'committed':
+                remaining = [source_path / name for name in entry['files'] if (source_path / name).exists()]
+                moved, failed_moves = self.move_uploaded_files(remaining)
+                if not failed_moves:
+                    self.journal.finish(project)
+                logger.info(f"[恢复] 账号组 {project} 已提交，补完文件移动 {len(moved)} 个")
+                continue
+            
+            # 崩溃可能发生在渠道已创建、日志尚未记录之间，按组内全部文件名（及打包渠道名）回滚
+            activated = any('-actived' in name for name in entry['files'])
+            channel_names = [Path(name).stem for name in entry['files']]
+            channel_names.append(packed_channel_name(project, activated))
+            if self.rollback_channels(channel_names):
+                self.journal.finish(project)
+                logger.info(f"[恢复] 账号组 {project} 未完成上传，已回滚")
+            else:
+                self.journal.set_state(project, 'rollback_failed')
+                logger.error(f"[恢复] 账号组 {project} 回滚未完成，下次启动时重试")
+    
+    def run_upload(self, upload_count, source_dir, use_async=False, max_in_flight=20, rate_per_host=10,
+                   atomic=False, pack=None):
+        """
+        执行上传任务，返回 UploadResult（不退出进程，异常记录在 result.error 中）
+        Args:
+            use_async: 使用异步上传引擎，同一账号组的文件一起上传
+            max_in_flight: 异步模式下同时进行的最大请求数
+            rate_per_host: 异步模式下每个主机每秒最多请求数
+            atomic: 按账号组事务上传，组内全部成功才移动文件，否则回滚已创建的渠道
+            pack: 每个账号组打包为一个多密钥渠道，为None时取配置 multi_key_packing
+        """
+        if pack is None:
+            pack = self.pack_groups
+
+        result = UploadResult(source_dir, upload_count)
+        started = time.monotonic()
+        try:
+            # 先处理上次中断遗留的账号组事务，上传期间持有事务日志的共享锁
+            self.recover_pending_groups()
+            with self.journal.uploading():
+                self._run_upload(result, upload_count, source_dir, use_async, max_in_flight, rate_per_host, atomic, pack)
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"上传任务异常: {e}")
+        result.duration_seconds = time.monotonic() - started
+        return result
+
+    def _run_upload(self, result, upload_count, source_dir, use_async, max_in_flight, rate_per_host, atomic, pack):
+        """run_upload 的实现，结果逐项写入 result"""
         logger.info("=" * 50)
         logger.info("批量上传任务开始（使用最新API格式）")
         logger.info(f"本次将上传 {upload_count} 个文件（{upload_count//3} 个项目组）")
@@ -313,7 +564,8 @@ class BatchUploader:
         
         if not groups:
             logger.error("没有找到完整的项目组！")
-            return False
+            result.error = "没有找到完整的项目组"
+            return
         
         logger.info(f"找到 {len(groups)} 个完整项目组：")
         for project, files in groups.items():
@@ -327,37 +579,75 @@ class BatchUploader:
         
         if not selected_files:
             logger.error("没有可上传的文件！")
-            return False
+            result.error = "没有可上传的文件"
+            return
+        result.selected = selected_files
         
         logger.info(f"即将上传以下 {len(selected_files)} 个文件：")
         for file in selected_files:
             logger.info(f"  - {file.name}")
         
         # 开始上传
-        logger.info("开始并发上传...")
         success_list = []
         fail_list = []
         success_files = []  # 用于记录成功上传的文件路径
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(self.upload_channel, file) for file in selected_files]
-            for i, future in enumerate(as_completed(futures), 1):
-                name, file_path, success, message = future.result()
-                if success:
-                    success_list.append(name)
-                    success_files.append(file_path)
-                    logger.info(f"[{i}/{len(selected_files)}] [成功] {name}")
-                else:
-                    fail_list.append((name, message))
-                    logger.error(f"[{i}/{len(selected_files)}] [失败] {name}，原因：{message}")
+        def record_result(file_result):
+            result.results.append(file_result)
+            name, file_path, success, message = file_result
+            i = len(success_list) + len(fail_list) + 1
+            if success:
+                success_list.append(name)
+                success_files.append(file_path)
+                logger.info(f"[{i}/{len(selected_files)}] [成功] {name}")
+            else:
+                fail_list.append((name, message))
+                logger.error(f"[{i}/{len(selected_files)}] [失败] {name}，原因：{message}")
+
+        if use_async and httpx is None:
+            logger.warning("未安装httpx，回退为线程池上传")
+            use_async = False
+
+        selected = set(selected_files)
+        selected_groups = {project: files for project, files in groups.items() if files[0] in selected}
+        committer = GroupCommitter(self, source_dir) if atomic else None
+        if atomic:
+            logger.info("按账号组事务上传：组内全部成功才移动文件，否则回滚已创建的渠道")
+        if pack:
+            logger.info("打包上传：每个账号组创建一个多密钥渠道")
+
+        if use_async:
+            logger.info(f"开始异步并发上传（最大并发 {max_in_flight}，每主机限速 {rate_per_host}/秒）...")
+            engine = AsyncUploadEngine(self, max_in_flight, rate_per_host, pack=pack)
+            engine.upload(selected_groups, record_result, committer)
+        elif atomic or pack:
+            logger.info("开始并发上传...")
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                futures = [executor.submit(self.upload_group, project, files, committer, pack)
+                           for project, files in selected_groups.items()]
+                for future in as_completed(futures):
+                    for file_result in future.result():
+                        record_result(file_result)
+        else:
+            logger.info("开始并发上传...")
+            with ThreadPoolExecutor(max_workers=5) as executor:
+                futures = [executor.submit(self.upload_channel, file) for file in selected_files]
+                for future in as_completed(futures):
+                    record_result(future.result())
 
-        # 移动上传成功的文件
-        if success_files:
+        if committer:
+            # 事务模式下文件已在各组提交时移动
+            moved_files = committer.moved_files
+            failed_move_files = committer.failed_move_files
+        elif success_files:
+            # 移动上传成功的文件
             logger.info(f"开始移动上传成功的 {len(success_files)} 个文件...")
             moved_files, failed_move_files = self.move_uploaded_files(success_files)
         else:
             moved_files = []
             failed_move_files = []
+        result.moved = moved_files
+        result.failed_moves = failed_move_files
 
         # 打印总结
         logger.info("====== 总结 ======")
@@ -375,10 +665,12 @@ class BatchUploader:
             for file_path, reason in failed_move_files:
                 logger.info(f"  - {file_path.name}: {reason}")
 
+        latency_summary = self.client.latency_summary()
+        if latency_summary:
+            logger.info(f"接口耗时: {latency_summary}")
+
         # 保存日志
         self.save_upload_log(upload_count, selected_files, success_list, fail_list, moved_files, failed_move_files)
-        
-        return len(success_list) > 0
     
     def save_upload_log(self, upload_count, selected_files, success_list, fail_list, moved_files, failed_move_files):
         """保存上传日志"""
@@ -411,13 +703,23 @@ class BatchUploader:
                     log_file.write(f"[移动失败] {file_path.name}，原因：{reason}\n")
 
 def main():
-    uploader = BatchUploader()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('logs/batch_upload.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
     
     try:
-        upload_count, source_dir = uploader.parse_arguments()
-        success = uploader.run_upload(upload_count, source_dir)
+        uploader = BatchUploader()
+        args = uploader.parse_arguments()
+        result = uploader.run_upload(args.upload_count, args.source, use_async=args.use_async,
+                                     max_in_flight=args.max_in_flight, rate_per_host=args.rate,
+                                     atomic=args.atomic, pack=True if args.pack else None)
         
-        if success:
+        if result.success:
             logger.info("🎉 上传任务完成!")
             sys.exit(0)
         else:
@@ -427,6 +729,9 @@ def main():
     except KeyboardInterrupt:
         logger.info("上传任务被用户中断")
         sys.exit(1)
+    except UploadConfigError as e:
+        logger.error(str(e))
+        sys.exit(1)
     except Exception as e:
         logger.error(f"上传任务异常: {e}")
         sys.exit(1)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渠道列表快照
+监控服务每个检查周期把获取到的完整渠道列表发布为快照（版本号+时间戳），
+面板直接读取最新快照，只有快照过期时才自己请求New API。
+快照写入本地文件（原子替换），配置了Redis时同时写入Redis，读取时优先Redis。
+快照中的渠道只保留面板使用的字段（ChannelState）。
+面板和监控的渠道查询条件（search_params）可以不同，快照按查询条件分别存放，
+只读取与自己查询条件相同的快照。
+"""
+
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from scripts import fast_json
+from scripts.models import ChannelState
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "gcp:channel_snapshot"
+
+# 分页参数不属于查询条件
+PAGING_PARAMS = ('p', 'page_size')
+
+
+def normalize_search_params(search_params):
+    """查询条件的规范形式（参数排序，去掉分页参数），用于区分不同查询的快照"""
+    params = sorted(
+        (key, value) for key, value in parse_qsl(search_params or '', keep_blank_values=True)
+        if key not in PAGING_PARAMS
+    )
+    return urlencode(params)
+
+
+class ChannelSnapshotStore:
+    """渠道列表快照的发布和读取"""
+
+    def __init__(self, path="logs/channel_snapshot.json", redis_client=None, available=None, search_params=''):
+        """
+        Args:
+            redis_client: redis.Redis实例，为None时只使用文件
+            available: 返回Redis当前是否可用的函数，不可用时只使用文件
+            search_params: 获取渠道列表使用的查询条件，不同查询条件的快照分别存放
+        """
+        self.search_params = normalize_search_params(search_params)
+        digest = hashlib.sha1(self.search_params.encode('utf-8')).hexdigest()[:12]
+        path = Path(path)
+        self.path = path.with_name(f"{path.stem}-{digest}{path.suffix}")
+        self.redis_key = f"{REDIS_KEY}:{digest}"
+        self.redis = redis_client
+        self.available = available or (lambda: True)
+
+    def _use_redis(self):
+        return self.redis is not None and self.available()
+
+    def publish(self, channels, source):
+        """
+        发布一份快照，返回版本号
+        Args:
+            channels: 完整渠道列表（New API原始格式或 ChannelState）
+            source: 发布者，如 monitor / panel
+        """
+        version = self._next_version()
+        snapshot = {
+            'version': version,
+            'published_at': time.time(),
+            'source': source,
+            'count': len(channels),
+            'search_params': self.search_params,
+            'channels': [c if isinstance(c, ChannelState) else ChannelState.from_api(c) for c in channels]
+        }
+        payload = fast_json.dumps(snapshot)
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"写入渠道快照文件失败: {e}")
+
+        if self._use_redis():
+            try:
+                self.redis.set(self.redis_key, payload)
+            except Exception as e:
+                logger.warning(f"写入Redis渠道快照失败: {e}")
+
+        return version
+
+    def _next_version(self):
+        """版本号单调递增：有Redis时用INCR，否则在文件中的版本上加1"""
+        if self._use_redis():
+            try:
+                return self.redis.incr(f"{self.redis_key}:version")
+            except Exception as e:
+                logger.warning(f"获取Redis快照版本失败: {e}")
+
+        current = self._load_file()
+        return (current['version'] if current else 0) + 1
+
+    def _load_file(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return fast_json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取渠道快照文件失败: {e}")
+            return None
+
+    def load(self):
+        """读取最新快照，优先Redis，没有时返回None"""
+        if self._use_redis():
+            try:
+                raw = self.redis.get(self.redis_key)
+                if raw:
+                    return fast_json.loads(raw)
+            except Exception as e:
+                logger.warning(f"读取Redis渠道快照失败，改读文件: {e}")
+
+        return self._load_file()
+
+    def load_fresh(self, max_age):
+        """读取不超过 max_age 秒、查询条件相同的快照，过期、不存在或查询条件不同时返回None"""
+        snapshot = self.load()
+        if snapshot is None or time.time() - snapshot.get('published_at', 0) > max_age:
+            return None
+        if snapshot.get('search_params') != self.search_params:
+            return None
+        return snapshot
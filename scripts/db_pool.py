@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MySQL连接池包装
+mysql-connector 的连接池用尽时立即抛出 PoolError；这里在借出前有限时间排队等待，
+记录等待时间、持有时间，连接持有过久时记录借出位置（疑似泄漏），并提供利用率指标。
+"""
+
+import logging
+import threading
+import time
+import traceback
+
+from mysql.connector.errors import PoolError
+
+from scripts.new_api_client import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# 等待借出连接的耗时分布桶（秒）
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# 连接持有时长分布桶（秒）
+HOLD_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class PoolTimeout(PoolError):
+    """等待可用连接超时"""
+
+
+class TrackedConnection:
+    """借出的连接代理：close() 时归还并记录持有时长，其余属性转发给原连接"""
+
+    def __init__(self, pool, connection, call_site):
+        self._pool = pool
+        self._connection = connection
+        self.call_site = call_site
+        self.checked_out_at = time.monotonic()
+        self.leak_reported = False
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._connection.close()
+        finally:
+            self._pool._release(self)
+
+
+class InstrumentedPool:
+    """带排队等待、指标和泄漏检测的连接池"""
+
+    def __init__(self, pool, pool_size, wait_timeout=5, leak_seconds=30):
+        """
+        Args:
+            pool: mysql.connector.pooling.MySQLConnectionPool
+            pool_size: 连接池大小（同时借出的上限）
+            wait_timeout: 连接全部借出时最长等待时间（秒），超时抛出 PoolTimeout
+            leak_seconds: 连接持有超过该时长时记录借出位置
+        """
+        self.pool = pool
+        self.pool_size = pool_size
+        self.wait_timeout = wait_timeout
+        self.leak_seconds = leak_seconds
+
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._lock = threading.Lock()
+        self.outstanding = set()
+        self.waiting = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.leaks = 0
+        self.wait_histogram = LatencyHistogram(WAIT_BUCKETS)
+        self.hold_histogram = LatencyHistogram(HOLD_BUCKETS)
+
+        self._leak_thread = threading.Thread(target=self._watch_leaks, name="db-pool-leaks", daemon=True)
+        self._leak_thread.start()
+
+    def get_connection(self):
+        """借出连接，连接全部借出时排队等待"""
+        started = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.wait_timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+        waited = time.monotonic() - started
+        if not acquired:
+            with self._lock:
+                self.timeouts += 1
+            self.wait_histogram.observe(waited, error=True)
+            raise PoolTimeout(f"等待数据库连接超时（{self.wait_timeout}秒，{self.pool_size} 个连接全部借出）")
+
+        try:
+            connection = self.pool.get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self.wait_histogram.observe(waited)
+        # 记录调用方位置（跳过本函数和 PanelManager.get_db_connection）
+        call_site = ''.join(traceback.format_list(traceback.extract_stack(limit=6)[:-2])).strip()
+        tracked = TrackedConnection(self, connection, call_site)
+        with self._lock:
+            self.outstanding.add(tracked)
+            self.checkouts += 1
+            self.max_in_use = max(self.max_in_use, len(self.outstanding))
+        return tracked
+
+    def _release(self, tracked):
+        held = time.monotonic() - tracked.checked_out_at
+        with self._lock:
+            self.outstanding.discard(tracked)
+        self.hold_histogram.observe(held)
+        if tracked.leak_reported:
+            logger.warning(f"疑似泄漏的数据库连接已归还，持有 {held:.1f} 秒")
+        self._slots.release()
+
+    def _watch_leaks(self):
+        """定期检查持有过久的连接，每个连接只记录一次"""
+        interval = max(1, self.leak_seconds / 2)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                suspects = [c for c in self.outstanding
+                            if not c.leak_reported and now - c.checked_out_at > self.leak_seconds]
+                for connection in suspects:
+                    connection.leak_reported = True
+                    self.leaks += 1
+            for connection in suspects:
+                logger.warning(
+                    f"数据库连接已持有 {now - connection.checked_out_at:.1f} 秒未归还，借出位置:\n{connection.call_site}"
+                )
+
+    def stats(self):
+        """连接池利用率指标"""
+        with self._lock:
+            in_use = len(self.outstanding)
+            return {
+                'pool_size': self.pool_size,
+                'in_use': in_use,
+                'idle': self.pool_size - in_use,
+                'waiting': self.waiting,
+                'max_in_use': self.max_in_use,
+                'checkouts_total': self.checkouts,
+                'timeouts_total': self.timeouts,
+                'leaks_total': self.leaks,
+                'wait_seconds': self.wait_histogram.snapshot(),
+                'hold_seconds': self.hold_histogram.snapshot()
+            }
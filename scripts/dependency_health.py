@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部依赖（MySQL、Redis）状态跟踪和后台重连
+依赖不可用时不影响进程启动：使用方记录失败后立即返回错误（不再等待连接超时），
+后台线程按指数退避重试，恢复后调用注册的回调。/health 据此报告 degraded。
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyUnavailable(Exception):
+    """依赖当前不可用（正在后台重连）"""
+
+
+class DependencyState:
+    """单个依赖的状态"""
+
+    __slots__ = ('name', 'check', 'on_recover', 'ignore', 'state', 'last_error', 'changed_at', 'failures', 'next_retry')
+
+    def __init__(self, name, check, on_recover=None, ignore=()):
+        self.name = name
+        self.check = check
+        self.on_recover = on_recover
+        self.ignore = tuple(ignore)
+        self.state = 'unknown'
+        self.last_error = None
+        self.changed_at = time.time()
+        self.failures = 0
+        self.next_retry = 0
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'since': self.changed_at,
+            'last_error': self.last_error,
+            'failures': self.failures
+        }
+
+
+class DependencyHealth:
+    """依赖状态表 + 后台重连线程"""
+
+    def __init__(self, retry_interval=2, max_retry_interval=60):
+        """
+        Args:
+            retry_interval: 首次重试间隔（秒）
+            max_retry_interval: 重试间隔上限（秒）
+        """
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.dependencies = {}
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def register(self, name, check, on_recover=None, ignore=()):
+        """
+        注册依赖
+        Args:
+            check: 检查函数，不可用时抛出异常
+            on_recover: 从不可用恢复后调用
+            ignore: 不表示依赖故障的异常类型（如连接池繁忙），检查和 mark_failed 遇到时都不标记为不可用
+        """
+        self.dependencies[name] = DependencyState(name, check, on_recover, ignore)
+
+    def start(self):
+        """启动后台线程：先检查一次所有依赖，之后只重试不可用的依赖"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="dependency-health", daemon=True)
+            self._thread.start()
+
+    def is_available(self, name):
+        """依赖未确认不可用时返回True（未知状态也允许使用）"""
+        dependency = self.dependencies.get(name)
+        return dependency is None or dependency.state != 'down'
+
+    def ensure_available(self, name):
+        if not self.is_available(name):
+            dependency = self.dependencies[name]
+            raise DependencyUnavailable(f"{name} 不可用（后台重连中）: {dependency.last_error}")
+
+    def mark_ok(self, name):
+        dependency = self.dependencies.get(name)
+        if dependency is None:
+            return
+        with self._lock:
+            recovered = dependency.state == 'down'
+            if dependency.state != 'up':
+                dependency.state = 'up'
+                dependency.changed_at = time.time()
+            dependency.failures = 0
+            dependency.last_error = None
+        if recovered:
+            logger.info(f"{name} 已恢复连接")
+            if dependency.on_recover:
+                try:
+                    dependency.on_recover()
+                except Exception as e:
+                    logger.error(f"{name} 恢复回调失败: {e}")
+
+    def mark_failed(self, name, error):
+        """记录依赖失败，唤醒后台线程按退避间隔重连"""
+        dependency = self.dependencies.get(name)
+        if dependency is None or isinstance(error, dependency.ignore):
+            return
+        with self._lock:
+            if dependency.state != 'down':
+                dependency.state = 'down'
+                dependency.changed_at = time.time()
+                logger.warning(f"{name} 不可用，后台重连: {error}")
+            dependency.failures += 1
+            dependency.last_error = str(error)
+            delay = min(self.max_retry_interval, self.retry_interval * 2 ** (dependency.failures - 1))
+            dependency.next_retry = time.monotonic() + delay
+        self._wake_event.set()
+
+    def probe(self, name):
+        """立即检查一次依赖，返回是否可用"""
+        dependency = self.dependencies[name]
+        try:
+            dependency.check()
+        except dependency.ignore as e:
+            # 依赖本身可以访问（例如只是连接池繁忙）
+            logger.debug(f"{name} 检查: {e}")
+        except Exception as e:
+            self.mark_failed(name, e)
+            return False
+        self.mark_ok(name)
+        return True
+
+    def status(self):
+        """返回 (整体状态, 各依赖状态)；整体状态为 healthy 或 degraded"""
+        with self._lock:
+            details = {name: dependency.to_dict() for name, dependency in self.dependencies.items()}
+        overall = 'degraded' if any(item['state'] == 'down' for item in details.values()) else 'healthy'
+        return overall, details
+
+    def _run(self):
+        for name in list(self.dependencies):
+            self.probe(name)
+
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                waiting = [d for d in self.dependencies.values() if d.state == 'down']
+            due = [d for d in waiting if d.next_retry <= now]
+            for dependency in due:
+                self.probe(dependency.name)
+
+            if waiting and not due:
+                timeout = max(0.1, min(d.next_retry for d in waiting) - now)
+            elif waiting:
+                timeout = 0.1
+            else:
+                timeout = None
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
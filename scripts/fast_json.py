@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化
+安装了 orjson 时使用 orjson（比标准库快数倍），否则使用标准库的紧凑输出。
+带 to_json() 的记录类型（scripts.models）按其字典格式输出，其他无法序列化的对象交给 default。
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _encoder(default):
+    def encode(obj):
+        to_json = getattr(obj, 'to_json', None)
+        if to_json is not None:
+            return to_json()
+        if default is None:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+        return default(obj)
+    return encode
+
+
+def dumps(obj, default=None):
+    """序列化为 str（不转义非ASCII字符）"""
+    encode = _encoder(default)
+    if orjson is not None:
+        try:
+            # 日期等类型交给 default，与标准库的输出保持一致
+            return orjson.dumps(
+                obj, default=encode,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        except TypeError:
+            # 超出64位的整数等 orjson 不支持的内容
+            pass
+    return json.dumps(obj, default=encode, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(data):
+    """反序列化 str 或 bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
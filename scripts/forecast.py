@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+额度消耗预测
+按每个监控周期采样的已用额度估算每个可用账号的消耗速度，预测到达额度上限
+（未激活账号$300，已激活账号$100）的时间；再结合近期的禁用频率（来自status_history，
+轻量模式下来自本进程观察到的禁用）估计预测期内的失效数，供监控在可用数跌破下限之前提前补充。
+预测结果写入 logs/forecast.json，面板通过 /api/forecast 查看。
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from scripts.account_scanner import parse_group_prefix
+
+logger = logging.getLogger(__name__)
+
+# 500000 额度 = $1
+QUOTA_PER_DOLLAR = 500000
+
+# 额度上限：未激活账号$300，已激活账号$100
+QUOTA_LIMITS = {False: 300 * QUOTA_PER_DOLLAR, True: 100 * QUOTA_PER_DOLLAR}
+
+# 计算消耗速度所需的最短采样跨度（秒）
+MIN_SAMPLE_SPAN = 60
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class QuotaForecaster:
+    """账号额度消耗预测器"""
+
+    def __init__(self, horizon_seconds, window_seconds=21600, output_path="logs/forecast.json"):
+        """
+        Args:
+            horizon_seconds: 预测期，应覆盖一个检查间隔加上传耗时
+            window_seconds: 计算消耗速度使用的采样窗口
+            output_path: 预测结果输出文件
+        """
+        self.horizon_seconds = horizon_seconds
+        self.window_seconds = window_seconds
+        self.output_path = Path(output_path)
+        self.samples = {}  # 账号名 -> deque[(采样时间, 已用额度)]
+        self.last_status = {}  # 账号名 -> 上次采样时是否可用
+        self.started_at = None  # 第一次采样时间
+        self.observed_disables = deque()  # 本进程观察到的禁用时间
+        self.history_rate = None  # 来自status_history的每小时禁用数
+
+    def set_history_rate(self, disabled_count, hours):
+        """设置来自status_history的禁用频率（最近 hours 小时内 disabled_count 次 active -> disabled）"""
+        self.history_rate = disabled_count / hours if hours > 0 else None
+
+    def disable_rate(self, now):
+        """每小时禁用数：优先使用status_history，否则使用本进程观察到的禁用（至少按1小时折算）"""
+        if self.history_rate is not None:
+            return self.history_rate
+
+        while self.observed_disables and now - self.observed_disables[0] > self.window_seconds:
+            self.observed_disables.popleft()
+        hours = max(1.0, min(now - self.started_at, self.window_seconds) / 3600)
+        return len(self.observed_disables) / hours
+
+    def _record(self, name, used_quota, now):
+        """记录一次采样，返回窗口内的消耗速度（额度/秒），样本不足时返回None"""
+        samples = self.samples.setdefault(name, deque())
+        if samples and used_quota < samples[-1][1]:
+            # 额度变小说明渠道被重建或重置，重新采样
+            samples.clear()
+        samples.append((now, used_quota))
+        while len(samples) > 2 and now - samples[0][0] > self.window_seconds:
+            samples.popleft()
+
+        span = now - samples[0][0]
+        if span < MIN_SAMPLE_SPAN:
+            return None
+        return (used_quota - samples[0][1]) / span
+
+    def update(self, api_keys, now=None):
+        """
+        用本周期的账号（密钥）列表更新预测并写入输出文件
+        Args:
+            api_keys: 展开后的账号记录，含 name/status/used_quota
+        Returns:
+            预测结果字典，predicted_active 为预测期结束时的可用账号数
+        """
+        now = time.time() if now is None else now
+        if self.started_at is None:
+            self.started_at = now
+        accounts = []
+        seen = set()
+
+        for key in api_keys:
+            name = key.get('name', '')
+            seen.add(name)
+            active = key.get('status') == 1
+            if self.last_status.get(name) and not active:
+                self.observed_disables.append(now)
+            self.last_status[name] = active
+            if not active:
+                self.samples.pop(name, None)
+                continue
+
+            used_quota = key.get('used_quota', 0)
+            activated = '-actived' in name
+            quota_limit = QUOTA_LIMITS[activated]
+            rate = self._record(name, used_quota, now)
+
+            eta_seconds = None
+            if used_quota >= quota_limit:
+                eta_seconds = 0
+            elif rate:
+                eta_seconds = (quota_limit - used_quota) / rate
+
+            accounts.append({
+                'name': name,
+                'group': parse_group_prefix(name),
+                'activated': activated,
+                'used_quota': used_quota,
+                'quota_limit': quota_limit,
+                'burn_rate_per_hour': round(rate * 3600 / QUOTA_PER_DOLLAR, 4) if rate is not None else None,
+                'eta_seconds': round(eta_seconds) if eta_seconds is not None else None,
+                'eta': _format_time(now + eta_seconds) if eta_seconds is not None else None
+            })
+
+        # 清理已不存在的账号
+        for name in list(self.last_status):
+            if name not in seen:
+                self.last_status.pop(name, None)
+                self.samples.pop(name, None)
+
+        accounts.sort(key=lambda a: (a['eta_seconds'] is None, a['eta_seconds'] or 0))
+        predicted_exhausted = sum(
+            1 for a in accounts if a['eta_seconds'] is not None and a['eta_seconds'] <= self.horizon_seconds
+        )
+
+        # 禁用频率已包含额度耗尽导致的禁用，两者取较大值而不是相加
+        disable_rate = self.disable_rate(now)
+        expected_failures = disable_rate * self.horizon_seconds / 3600
+        predicted_loss = max(predicted_exhausted, math.ceil(expected_failures))
+
+        groups = {}
+        for account in accounts:
+            if account['eta_seconds'] is None or account['group'] is None:
+                continue
+            group = groups.setdefault(account['group'], {
+                'prefix': account['group'],
+                'activated': account['activated'],
+                'eta_seconds': account['eta_seconds'],
+                'eta': account['eta'],
+                'accounts': 0
+            })
+            group['accounts'] += 1
+            if account['eta_seconds'] < group['eta_seconds']:
+                group['eta_seconds'] = account['eta_seconds']
+                group['eta'] = account['eta']
+
+        forecast = {
+            'generated_at': _format_time(now),
+            'horizon_seconds': self.horizon_seconds,
+            'active': len(accounts),
+            'predicted_exhausted': predicted_exhausted,
+            'disable_rate_per_hour': round(disable_rate, 4),
+            'disable_rate_source': 'status_history' if self.history_rate is not None else 'observed',
+            'expected_failures': round(expected_failures, 2),
+            'predicted_active': len(accounts) - predicted_loss,
+            'groups': sorted(groups.values(), key=lambda g: g['eta_seconds']),
+            'accounts': accounts
+        }
+        self.save(forecast)
+        return forecast
+
+    def save(self, forecast):
+        """原子写入预测结果"""
+        try:
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.output_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(forecast, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.output_path)
+        except OSError as e:
+            logger.error(f"写入预测结果失败: {e}")
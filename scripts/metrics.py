@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus文本格式输出
+把连接池统计、LatencyHistogram.snapshot() 等转换为 /metrics 的文本格式。
+"""
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    inner = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + inner + '}'
+
+
+class MetricsWriter:
+    """按指标族累积输出行，同名指标的 HELP/TYPE 只输出一次"""
+
+    def __init__(self):
+        self.lines = []
+        self._declared = set()
+
+    def _declare(self, name, help_text, metric_type):
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {metric_type}")
+
+    def gauge(self, name, help_text, value, labels=None):
+        self._declare(name, help_text, 'gauge')
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def counter(self, name, help_text, value, labels=None):
+        self._declare(name, help_text, 'counter')
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, help_text, snapshot, labels=None):
+        """snapshot 为 LatencyHistogram.snapshot() 的结果（累计桶计数）"""
+        self._declare(name, help_text, 'histogram')
+        labels = labels or {}
+        for bound, count in snapshot['buckets'].items():
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+        self.lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+        self.lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
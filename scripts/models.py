@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号文件、账号组和渠道的记录类型
+使用 __slots__ 减少大账号池/大渠道列表的内存占用；修改时间等展示字段在第一次使用时才格式化并保存。
+to_json() 返回与原来的字典格式一致的结构，由 scripts.fast_json 在序列化时调用。
+"""
+
+import time
+
+
+class AccountFile:
+    """一个账号文件"""
+
+    __slots__ = ('file', 'path', 'size', 'mtime', '_modified')
+
+    def __init__(self, file, path, size, mtime):
+        self.file = file
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self._modified = None
+
+    @property
+    def modified(self):
+        # 账号池索引中的记录在多次请求间复用，只格式化一次
+        if self._modified is None:
+            self._modified = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.mtime))
+        return self._modified
+
+    def to_json(self):
+        return {'file': self.file, 'path': self.path, 'size': self.size, 'modified': self.modified}
+
+    def __repr__(self):
+        return f"AccountFile({self.path!r}, size={self.size})"
+
+
+class AccountGroup:
+    """一个目录中的账号组，files 为按序号排序的 AccountFile 元组"""
+
+    __slots__ = ('prefix', 'stage', 'files')
+
+    def __init__(self, prefix, stage, files):
+        self.prefix = prefix
+        self.stage = stage
+        self.files = tuple(files)
+
+    @property
+    def file_count(self):
+        return len(self.files)
+
+    @property
+    def total_size(self):
+        return sum(f.size or 0 for f in self.files)
+
+    def to_json(self):
+        # 账号池接口中账号组序列化为文件列表（前缀 -> [文件]）
+        return [f.to_json() for f in self.files]
+
+    def __repr__(self):
+        return f"AccountGroup({self.prefix!r}, {self.stage!r}, {self.file_count} files)"
+
+
+class ChannelState:
+    """渠道列表中面板使用的字段（New API返回的渠道包含大量用不到的配置）"""
+
+    __slots__ = ('id', 'name', 'status', 'used_quota', 'models', 'tag')
+
+    def __init__(self, id, name, status, used_quota=0, models='', tag=''):
+        self.id = id
+        self.name = name
+        self.status = status
+        self.used_quota = used_quota
+        self.models = models
+        self.tag = tag
+
+    @classmethod
+    def from_api(cls, item):
+        """由New API原始渠道数据（或已精简的快照数据）构造"""
+        return cls(
+            item.get('id'),
+            item.get('name') or '',
+            item.get('status', 0),
+            item.get('used_quota') or 0,
+            item.get('models') or '',
+            item.get('tag') or ''
+        )
+
+    def to_json(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'used_quota': self.used_quota,
+            'models': self.models,
+            'tag': self.tag
+        }
+
+    def __repr__(self):
+        return f"ChannelState({self.id!r}, {self.name!r}, status={self.status})"
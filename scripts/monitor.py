@@ -6,16 +6,31 @@
 """
 
 import os
+import sys
 import json
 import time
 import shutil
-import requests
 import mysql.connector
+import redis
 import argparse
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+# 允许以 python scripts/monitor.py 方式直接运行
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.account_groups import CREATE_TABLE_SQL as ACCOUNT_GROUPS_TABLE_SQL
+from scripts.account_groups import AccountGroupTable, GroupStageSync, group_stage
+from scripts.account_scanner import parse_group_prefix, scan_directory
+from scripts.account_watcher import AccountWatcher
+from scripts.batch_upload import BatchUploader, GroupCommitter
+from scripts.channel_snapshot import ChannelSnapshotStore
+from scripts.forecast import QuotaForecaster
+from scripts.new_api_client import LatencyHistogram, NewAPIError, expand_channel_keys, get_shared_client
+from scripts.poll_scheduler import AdaptivePollScheduler, PollDecision
+from scripts.pool_index import AccountPoolIndex
 
 # 配置日志
 logging.basicConfig(
@@ -28,6 +43,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 单个账号组上传（创建渠道+移动文件+写库）耗时分布桶（秒）
+GROUP_UPLOAD_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# 批量写入时每条多行INSERT包含的最大行数
+RECONCILE_BATCH_SIZE = 500
+
+# 从status_history刷新禁用频率的间隔（秒）
+HAZARD_REFRESH_INTERVAL = 3600
+
 class GCPAccountManager:
     def __init__(self, config_path="config/settings.json", mode="full"):
         """
@@ -40,8 +64,53 @@ class GCPAccountManager:
         """
         self.mode = mode
         self.load_config(config_path)
+        self.api_client = get_shared_client(self.config['new_api'])
         self.base_dir = Path("accounts")
         self.log_dir = Path("logs")
+        self.last_reconcile_timings = {}
+        self.last_reconcile_counters = {}
+        
+        # 渠道指纹缓存: 名称 -> (状态, 已用额度, 最后写入时间)，用于跳过未变化渠道的写入
+        self.channel_fingerprints = {}
+        self.fingerprints_loaded_at = 0
+        
+        # 账号组汇总表：阶段和成员数由 GroupStageSync 按账号池索引中变化的组写入（完整模式启动时创建），
+        # 已用额度随指纹缓存按组增量汇总，只写入额度变化的组
+        self.group_table = AccountGroupTable(self.get_db_connection)
+        self.pool_index = None
+        self.group_sync = None
+        self.group_quotas = {}       # 前缀 -> 组内账号已用额度之和
+        self.quota_dirty = set()     # 额度可能变化、尚未写入的组
+        self.written_quotas = None   # 已写入汇总表的 前缀 -> 已用额度，为None时下次重新载入
+        
+        # 额度消耗预测，预测期默认为两个检查间隔（覆盖下次检查和上传耗时）
+        monitoring = self.config['monitoring']
+        self.forecaster = QuotaForecaster(
+            horizon_seconds=monitoring.get('forecast_horizon_seconds') or 2 * monitoring['check_interval_seconds'],
+            window_seconds=monitoring.get('forecast_window_seconds', 21600),
+            output_path=self.log_dir / "forecast.json"
+        )
+        self.hazard_loaded_at = 0
+        
+        # 自适应检查间隔，上一周期的可用密钥集合用于计算状态变化数
+        self.scheduler = AdaptivePollScheduler(
+            base_interval=monitoring['check_interval_seconds'],
+            min_interval=monitoring.get('min_check_interval_seconds', 30),
+            max_interval=monitoring.get('max_check_interval_seconds', 1800)
+        )
+        self.last_active_keys = None
+        self.watcher = None
+        
+        # 在进程内调用批量上传（与监控共用New API客户端），每次补充的结果追加到日志
+        self.uploader = None
+        self.last_replenish = None
+        self.group_upload_latency = LatencyHistogram(GROUP_UPLOAD_BUCKETS)
+        
+        # 每次获取的渠道列表发布为快照，供面板读取
+        self.snapshot_store = ChannelSnapshotStore(
+            self.log_dir / "channel_snapshot.json", self.init_redis(),
+            search_params=self.config['new_api'].get('search_params', '')
+        )
         
         # 创建必要的目录
         directories = ["fresh", "uploaded", "exhausted_300", "activated", "exhausted_100", "archive"]
@@ -52,6 +121,8 @@ class GCPAccountManager:
         # 完整模式才初始化数据库
         if self.mode == "full":
             self.init_database()
+            self.pool_index = AccountPoolIndex(self.base_dir)
+            self.group_sync = GroupStageSync(self.group_table, self.pool_index, self.log_dir / "account_groups.lock")
             logger.info("监控器启动 - 完整模式（数据库+文件管理）")
         else:
             logger.info("监控器启动 - 轻量模式（仅监控+补充）")
@@ -79,13 +150,55 @@ class GCPAccountManager:
                     "target_channels": int(os.getenv('TARGET_CHANNELS', 15)),
                     # 添加查询路径配置
                     "search_path": os.getenv('NEW_API_SEARCH_PATH', '/api/channel/search'),
-                    "search_params": os.getenv('NEW_API_SEARCH_PARAMS', 'keyword=&group=svip&model=&id_sort=true&tag_mode=false')
+                    "search_params": os.getenv('NEW_API_SEARCH_PARAMS', 'keyword=&group=svip&model=&id_sort=true&tag_mode=false'),
+                    # 分页获取渠道配置
+                    "page_size": int(os.getenv('NEW_API_PAGE_SIZE', 100)),
+                    "fetch_concurrency": int(os.getenv('NEW_API_FETCH_CONCURRENCY', 4)),
+                    "pool_size": int(os.getenv('NEW_API_POOL_SIZE', 10)),
+                    # 每个账号组打包为一个多密钥渠道
+                    "multi_key_packing": os.getenv('NEW_API_MULTI_KEY', 'false').lower() == 'true'
                 },
                 "monitoring": {
-                    "check_interval_seconds": int(os.getenv('CHECK_INTERVAL', 300))
+                    "check_interval_seconds": int(os.getenv('CHECK_INTERVAL', 300)),
+                    # 未变化渠道刷新last_updated的间隔
+                    "touch_interval_seconds": int(os.getenv('TOUCH_INTERVAL', 3600)),
+                    # 额度预测：预测期（0为两个检查间隔）和计算消耗速度的采样窗口
+                    "forecast_horizon_seconds": int(os.getenv('FORECAST_HORIZON', 0)),
+                    "forecast_window_seconds": int(os.getenv('FORECAST_WINDOW', 21600)),
+                    # 自适应检查间隔
+                    "adaptive_interval": os.getenv('ADAPTIVE_INTERVAL', 'true').lower() == 'true',
+                    "min_check_interval_seconds": int(os.getenv('MIN_CHECK_INTERVAL', 30)),
+                    "max_check_interval_seconds": int(os.getenv('MAX_CHECK_INTERVAL', 1800)),
+                    # 完整模式同时上传的账号组数
+                    "upload_concurrency": int(os.getenv('UPLOAD_CONCURRENCY', 4))
+                },
+                "redis": {
+                    "host": os.getenv('REDIS_HOST', 'redis'),
+                    "port": int(os.getenv('REDIS_PORT', 6379)),
+                    "password": os.getenv('REDIS_PASSWORD') or None
                 }
             }
     
+    def init_redis(self):
+        """连接Redis（用于发布渠道快照），未配置或连接失败时返回None，只写快照文件"""
+        if 'redis' not in self.config:
+            return None
+        try:
+            client = redis.Redis(
+                host=self.config['redis']['host'],
+                port=self.config['redis']['port'],
+                password=self.config['redis'].get('password'),
+                db=self.config['redis'].get('db', 0),
+                decode_responses=True,
+                socket_connect_timeout=self.config['redis'].get('connect_timeout', 2)
+            )
+            client.ping()
+            logger.info("Redis连接成功，渠道快照同时写入Redis")
+            return client
+        except Exception as e:
+            logger.warning(f"Redis连接失败，渠道快照只写入文件: {e}")
+            return None
+    
     def get_db_connection(self):
         """获取MySQL数据库连接"""
         if self.mode != "full":
@@ -139,205 +252,323 @@ class GCPAccountManager:
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
         ''')
         
+        # 创建账号组汇总表
+        cursor.execute(ACCOUNT_GROUPS_TABLE_SQL)
+        
         conn.commit()
         conn.close()
         logger.info("数据库表初始化完成")
     
     def get_new_api_status(self):
-        """获取New API的所有渠道状态"""
+        """获取New API的所有渠道状态（分页流式获取）"""
         try:
-            # 使用配置的路径和参数
-            base_url = self.config['new_api']['base_url']
-            search_path = self.config['new_api']['search_path']
-            search_params = self.config['new_api']['search_params']
-            
-            api_url = f"{base_url}{search_path}?{search_params}"
-            
-            headers = {
-                "accept": "application/json, text/plain, */*",
-                "accept-language": "zh-CN,zh;q=0.9,en;q=0.8",
-                "cache-control": "no-store",
-                "new-api-user": "1",
-                "authorization": f"Bearer {self.config['new_api']['api_key']}",
-                "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            }
-            
-            logger.info(f"查询API URL: {api_url}")
-            response = requests.get(api_url, headers=headers, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success', False):
-                    return data.get('data', {}).get('items', [])
-                else:
-                    logger.error(f"API返回失败: {data.get('message', '未知错误')}")
-                    return []
-            else:
-                logger.error(f"获取API状态失败: {response.status_code}")
-                return []
-                
+            return self.api_client.get_channels()
+        except NewAPIError as e:
+            logger.error(f"获取API状态失败: {e}")
+            return []
         except Exception as e:
             logger.error(f"API请求异常: {e}")
             return []
     
     def update_account_status(self, api_channels):
-        """根据API返回更新账号状态（仅完整模式）"""
+        """
+        根据API返回对账账号状态（仅完整模式）
+        多密钥渠道按密钥展开为账号后对账；
+        只为指纹(状态, 已用额度)发生变化的账号写库，未变化的账号只在超过touch间隔时刷新一次；
+        状态、历史和被禁用账号的新文件路径在同一事务内批量写入，提交成功后才移动文件
+        （提交失败时文件仍在uploaded，下个周期重新处理；移动失败时下个周期同样会再次移动并写入路径）
+        """
         if self.mode != "full":
             return
-            
+        
+        timings = {}
+        phase_start = cycle_start = time.monotonic()
+        touch_interval = self.config['monitoring'].get('touch_interval_seconds', 3600)
+        now = time.time()
+        
         conn = self.get_db_connection()
         cursor = conn.cursor()
         
-        current_time = datetime.now()
-        
-        for channel in api_channels:
-            name = channel.get('name', '')
-            status = channel.get('status', 0)
-            used_quota = channel.get('used_quota', 0)
+        try:
+            # 1. 指纹缓存为空或到达重新同步时间时，一次性载入当前所有账号状态
+            if not self.channel_fingerprints or now - self.fingerprints_loaded_at >= touch_interval:
+                cursor.execute(
+                    "SELECT account_name, current_status, used_quota, UNIX_TIMESTAMP(last_updated) FROM account_status"
+                )
+                self.channel_fingerprints = {
+                    name: (status, used_quota, float(last_updated or 0))
+                    for name, status, used_quota, last_updated in cursor.fetchall()
+                }
+                self.fingerprints_loaded_at = now
+                
+                # 按组重新汇总额度，与已写入的额度逐组核对一次
+                self.group_quotas = {}
+                for name, (_, used_quota, _) in self.channel_fingerprints.items():
+                    prefix = parse_group_prefix(name)
+                    if prefix:
+                        self.group_quotas[prefix] = self.group_quotas.get(prefix, 0) + (used_quota or 0)
+                self.quota_dirty = set(self.group_quotas)
+            timings['载入'] = time.monotonic() - phase_start
             
-            # 检查是否是激活的账号
-            is_activated = '-actived' in name
+            # 2. 在内存中与New API渠道列表比对
+            phase_start = time.monotonic()
+            current_time = datetime.fromtimestamp(now)
+            counters = {'changed': 0, 'new': 0, 'touched': 0, 'unchanged': 0}
+            status_rows = {}
+            history_rows = []
+            disabled_accounts = []
             
-            # 获取当前数据库中的状态
-            cursor.execute(
-                "SELECT current_status, used_quota FROM account_status WHERE account_name = %s",
-                (name,)
-            )
-            result = cursor.fetchone()
+            accounts = [key for channel in api_channels for key in expand_channel_keys(channel)]
+            for channel in accounts:
+                name = channel.get('name', '')
+                status = channel.get('status', 0)
+                used_quota = channel.get('used_quota', 0)
+                
+                # 检查是否是激活的账号
+                is_activated = '-actived' in name
+                
+                new_status = 'active' if status == 1 else 'disabled'
+                fingerprint = self.channel_fingerprints.get(name)
+                
+                if status != 1:
+                    disabled_accounts.append(name)
+                
+                if fingerprint is None:
+                    counters['new'] += 1
+                elif fingerprint[:2] != (new_status, used_quota):
+                    counters['changed'] += 1
+                    
+                    # 如果状态改变，记录历史
+                    old_status = fingerprint[0]
+                    if old_status != new_status:
+                        history_rows.append((name, old_status, new_status, current_time, used_quota))
+                        logger.info(f"账号状态变更: {name} {old_status} -> {new_status}")
+                elif now - fingerprint[2] >= touch_interval:
+                    counters['touched'] += 1
+                else:
+                    counters['unchanged'] += 1
+                    continue
+                
+                status_rows[name] = [name, new_status, '', current_time, used_quota, is_activated]
+            timings['比对'] = time.monotonic() - phase_start
+            
+            # 3. 确定被禁用账号的文件移动目标，新路径随状态一起写入
+            moves = []
+            for name in disabled_accounts:
+                planned = self.plan_disabled_move(name)
+                if planned is None:
+                    continue
+                moves.append((name, *planned))
+                if name not in status_rows:
+                    # 指纹未变但文件需要移动，仍需写入新路径
+                    counters['unchanged'] -= 1
+                    counters['touched'] += 1
+                    fingerprint = self.channel_fingerprints[name]
+                    status_rows[name] = [name, fingerprint[0], '', current_time, fingerprint[1], '-actived' in name]
+                status_rows[name][2] = str(planned[1])
             
-            old_status = result[0] if result else None
-            new_status = 'active' if status == 1 else 'disabled'
+            # 4. 多行批量写入
+            phase_start = time.monotonic()
+            rows = [tuple(row) for row in status_rows.values()]
+            for i in range(0, len(rows), RECONCILE_BATCH_SIZE):
+                cursor.executemany('''
+                    INSERT INTO account_status 
+                    (account_name, current_status, file_path, last_updated, used_quota, is_activated)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    current_status = VALUES(current_status),
+                    file_path = IF(VALUES(file_path) = '', file_path, VALUES(file_path)),
+                    last_updated = VALUES(last_updated),
+                    used_quota = VALUES(used_quota),
+                    is_activated = VALUES(is_activated)
+                ''', rows[i:i + RECONCILE_BATCH_SIZE])
             
-            # 如果状态改变，记录历史
-            if old_status and old_status != new_status:
-                cursor.execute('''
+            for i in range(0, len(history_rows), RECONCILE_BATCH_SIZE):
+                cursor.executemany('''
                     INSERT INTO status_history (account_name, old_status, new_status, change_time, used_quota)
                     VALUES (%s, %s, %s, %s, %s)
-                ''', (name, old_status, new_status, current_time, used_quota))
-                
-                logger.info(f"账号状态变更: {name} {old_status} -> {new_status}")
+                ''', history_rows[i:i + RECONCILE_BATCH_SIZE])
             
-            # 更新或插入账号状态
-            cursor.execute('''
-                INSERT INTO account_status 
-                (account_name, current_status, file_path, last_updated, used_quota, is_activated)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                current_status = VALUES(current_status),
-                last_updated = VALUES(last_updated),
-                used_quota = VALUES(used_quota),
-                is_activated = VALUES(is_activated)
-            ''', (name, new_status, '', current_time, used_quota, is_activated))
+            conn.commit()
+            timings['写入'] = time.monotonic() - phase_start
             
-            # 处理文件移动（仅完整模式）
-            if status != 1:
-                self.handle_disabled_account(name)
+        except Exception:
+            conn.rollback()
+            # 写入失败时指纹缓存可能与数据库不一致，下次重新载入
+            self.channel_fingerprints = {}
+            raise
+        finally:
+            cursor.close()
+            conn.close()
         
-        conn.commit()
-        conn.close()
+        for name, new_status, _, _, used_quota, _ in rows:
+            previous = self.channel_fingerprints.get(name)
+            delta = (used_quota or 0) - ((previous[1] or 0) if previous else 0)
+            prefix = parse_group_prefix(name)
+            if prefix and delta:
+                self.group_quotas[prefix] = self.group_quotas.get(prefix, 0) + delta
+                self.quota_dirty.add(prefix)
+            self.channel_fingerprints[name] = (new_status, used_quota, now)
+        
+        # 5. 提交成功后移动文件
+        phase_start = time.monotonic()
+        for name, source_path, target_path in moves:
+            self.move_disabled_account(name, source_path, target_path)
+        timings['文件'] = time.monotonic() - phase_start
+        
+        timings['总计'] = time.monotonic() - cycle_start
+        self.last_reconcile_timings = timings
+        self.last_reconcile_counters = counters
+        logger.info(
+            f"状态对账完成: {len(api_channels)} 个渠道 {len(accounts)} 个账号 (变化 {counters['changed']}, 新增 {counters['new']}, "
+            f"刷新 {counters['touched']}, 未变化 {counters['unchanged']}), 写入 {len(rows)} 行, "
+            f"{len(history_rows)} 条状态变更 | 耗时 "
+            + ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in timings.items())
+        )
     
-    def handle_disabled_account(self, account_name):
-        """处理被禁用的账号（仅完整模式）"""
+    def sync_account_groups(self):
+        """
+        更新账号组汇总表（仅完整模式）
+        阶段和成员数：只同步目录事件（或目录修改时间变化）涉及的组，多个进程中由负责写入的一个进程写入；
+        已用额度：只写入指纹缓存中额度发生变化的组
+        """
         if self.mode != "full":
             return
-            
-        is_activated = '-actived' in account_name
         
-        if is_activated:
-            self.move_account_to_exhausted_100(account_name)
-        else:
-            self.move_account_to_exhausted_300(account_name)
+        started = time.monotonic()
+        stage_result = self.group_sync.sync()
+        
+        if self.written_quotas is None:
+            self.written_quotas = {prefix: row[2] for prefix, row in self.group_table.load().items()}
+        dirty, self.quota_dirty = self.quota_dirty, set()
+        counts = self.pool_index.stage_counts(dirty)
+        rows = []
+        for prefix in dirty:
+            quota = self.group_quotas.get(prefix, 0)
+            # 已没有任何文件的组不写入
+            if prefix in counts and self.written_quotas.get(prefix) != quota:
+                rows.append((prefix, *group_stage(counts[prefix]), quota))
+        try:
+            self.group_table.write_quotas(rows)
+        except Exception:
+            # 写入失败时下次重新载入已写入的额度并重试
+            self.quota_dirty |= dirty
+            self.written_quotas = None
+            raise
+        for prefix, _, _, quota in rows:
+            self.written_quotas[prefix] = quota
+        
+        stage_text = "由其他进程写入" if stage_result is None else f"更新 {stage_result[0]} 组, 删除 {stage_result[1]} 组"
+        logger.info(
+            f"账号组汇总完成: 阶段 {stage_text}, 额度 {len(rows)}/{len(dirty)} 组 | "
+            f"耗时 {(time.monotonic() - started) * 1000:.1f}ms"
+        )
     
-    def move_account_to_exhausted_300(self, account_name):
-        """移动账号到待激活目录"""
-        json_filename = f"{account_name}.json"
-        source_path = self.base_dir / "uploaded" / json_filename
-        target_path = self.base_dir / "exhausted_300" / json_filename
+    def refresh_hazard_rate(self):
+        """从status_history统计最近一个采样窗口内的禁用次数（仅完整模式，每小时一次）"""
+        if self.mode != "full" or time.time() - self.hazard_loaded_at < HAZARD_REFRESH_INTERVAL:
+            return
         
-        if source_path.exists():
-            shutil.move(str(source_path), str(target_path))
-            logger.info(f"账号移动到待激活: {account_name}")
-            self.update_file_path(account_name, str(target_path))
+        window_hours = self.forecaster.window_seconds / 3600
+        conn = self.get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT COUNT(*) FROM status_history
+                WHERE old_status = 'active' AND new_status = 'disabled' AND change_time >= %s
+            ''', (datetime.now() - timedelta(hours=window_hours),))
+            disabled_count = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+            conn.close()
+        
+        self.forecaster.set_history_rate(disabled_count, window_hours)
+        self.hazard_loaded_at = time.time()
     
-    def move_account_to_exhausted_100(self, account_name):
-        """移动激活账号到100刀用完目录"""
+    def plan_disabled_move(self, account_name):
+        """
+        被禁用账号的文件移动目标（仅完整模式）：激活账号移到exhausted_100，其余移到exhausted_300
+        Returns:
+            (源路径, 目标路径)，文件不在uploaded中时返回None
+        """
+        if self.mode != "full":
+            return None
+        
         json_filename = f"{account_name}.json"
         source_path = self.base_dir / "uploaded" / json_filename
-        target_path = self.base_dir / "exhausted_100" / json_filename
-        
-        if source_path.exists():
+        if not source_path.exists():
+            return None
+        target_dir = "exhausted_100" if '-actived' in account_name else "exhausted_300"
+        return source_path, self.base_dir / target_dir / json_filename
+    
+    def move_disabled_account(self, account_name, source_path, target_path):
+        """移动被禁用账号的文件（新路径已随状态写入），失败时文件留在uploaded，下个周期重试"""
+        try:
             shutil.move(str(source_path), str(target_path))
+        except OSError as e:
+            logger.error(f"移动被禁用账号文件失败: {account_name}，原因：{e}")
+            return
+        if target_path.parent.name == "exhausted_100":
             logger.info(f"激活账号100刀用完: {account_name}")
-            self.update_file_path(account_name, str(target_path))
+        else:
+            logger.info(f"账号移动到待激活: {account_name}")
     
-    def update_file_path(self, account_name, file_path):
-        """更新数据库中的文件路径"""
-        if self.mode != "full":
-            return
-            
-        conn = self.get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE account_status SET file_path = %s WHERE account_name = %s",
-            (file_path, account_name)
-        )
-        conn.commit()
-        conn.close()
+    def get_uploader(self):
+        """进程内批量上传器，首次补充时创建并复用"""
+        if self.uploader is None:
+            self.uploader = BatchUploader(api_config=self.config['new_api'])
+        return self.uploader
     
-    def call_batch_upload_script(self, need_accounts):
-        """调用批量上传脚本（轻量模式使用）"""
+    def replenish_with_uploader(self, need_accounts):
+        """进程内调用批量上传补充账号组（轻量模式使用），返回是否至少上传成功一个文件"""
+        # 需要上传的文件数量（每个账号组3个文件）
+        upload_count = need_accounts * 3
+        
+        # 优先使用已激活的账号
+        activated_groups = self.get_available_account_groups(self.base_dir / "activated")
+        if len(activated_groups) > 0:
+            source_dir = "activated"
+            upload_count = min(len(activated_groups) * 3, upload_count)
+        else:
+            source_dir = "fresh"
+        logger.info(f"批量上传 {upload_count} 个文件（来源 {source_dir}）")
+        
         try:
-            import subprocess
-            
-            # 需要上传的文件数量（每个账号组3个文件）
-            upload_count = need_accounts * 3
-            
-            # 优先使用已激活的账号
-            activated_groups = self.get_available_account_groups(self.base_dir / "activated")
-            if len(activated_groups) > 0:
-                command = f"python scripts/batch_upload.py {min(len(activated_groups) * 3, upload_count)} --source activated"
-                logger.info(f"调用批量上传脚本（已激活账号）: {command}")
-            else:
-                # 使用新账号
-                command = f"python scripts/batch_upload.py {upload_count} --source fresh"
-                logger.info(f"调用批量上传脚本（新账号）: {command}")
-            
-            result = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=300)
-            
-            if result.returncode == 0:
-                logger.info("批量上传脚本执行成功")
-                return True
-            else:
-                logger.error(f"批量上传脚本执行失败: {result.stderr}")
-                return False
-                
+            result = self.get_uploader().run_upload(upload_count, source_dir, atomic=True)
         except Exception as e:
-            logger.error(f"调用批量上传脚本异常: {e}")
+            logger.error(f"批量上传异常: {e}")
             return False
+        
+        self.record_replenish(result.to_dict())
+        if result.success:
+            logger.info(f"批量上传完成: 成功 {len(result.succeeded)} 个，失败 {len(result.failed)} 个，"
+                        f"耗时 {result.duration_seconds:.2f} 秒")
+            return True
+        logger.error(f"批量上传失败: {result.error or f'{len(result.failed)} 个文件上传失败'}")
+        return False
+    
+    def record_replenish(self, summary):
+        """把一次补充的耗时和逐文件（逐组）结果追加到 logs/replenish.jsonl"""
+        self.last_replenish = summary
+        try:
+            with open(self.log_dir / "replenish.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.last_replenish, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"记录补充结果失败: {e}")
     
     def get_available_account_groups(self, directory):
         """获取目录中可用的完整账号组"""
-        if not directory.exists():
+        scan = scan_directory(directory)
+        if scan is None:
             return []
-            
-        files = list(directory.glob("*.json"))
-        groups = {}
-        
-        for file in files:
-            name_parts = file.stem.split('-')
-            if len(name_parts) >= 4:
-                prefix = '-'.join(name_parts[:-1])
-                if prefix.endswith('-actived'):
-                    prefix = prefix.replace('-actived', '')
-                
-                if prefix not in groups:
-                    groups[prefix] = []
-                groups[prefix].append(file)
-        
-        return [prefix for prefix, files in groups.items() if len(files) == 3]
+        return list(scan.complete())
     
     def monitor_and_replenish(self):
-        """主监控和补充逻辑"""
+        """
+        主监控和补充逻辑
+        返回本周期摘要（可用/预测密钥数、状态变化数、是否补充），供自适应调度决定下次检查间隔；
+        获取渠道失败时返回None
+        """
         logger.info("="*50)
         logger.info(f"开始执行监控检查 - {self.mode}模式")
         
@@ -346,45 +577,72 @@ class GCPAccountManager:
         
         if not api_channels:
             logger.warning("获取通道数据失败，本次检查结束")
-            return
+            return None
+        
+        version = self.snapshot_store.publish(api_channels, source="monitor")
+        logger.info(f"已发布渠道快照 v{version}（{len(api_channels)} 个渠道）")
         
         # 完整模式才更新账号状态
         if self.mode == "full":
             self.update_account_status(api_channels)
         
-        # 统计当前可用渠道
+        # 统计当前可用渠道；多密钥渠道按可用密钥数计算容量
         active_channels = [ch for ch in api_channels if ch.get('status') == 1]
-        current_count = len(active_channels)
+        api_keys = [key for ch in api_channels for key in expand_channel_keys(ch)]
+        current_count = sum(1 for key in api_keys if key.get('status') == 1)
+        
+        # 与上一周期相比状态发生变化的密钥数
+        active_keys = {key.get('name') for key in api_keys if key.get('status') == 1}
+        churn = len(active_keys ^ self.last_active_keys) if self.last_active_keys is not None else 0
+        self.last_active_keys = active_keys
         
         min_channels = self.config['new_api']['min_channels']
         target_channels = self.config['new_api']['target_channels']
         
+        # 预测预测期结束时的可用密钥数
+        try:
+            self.refresh_hazard_rate()
+        except Exception as e:
+            logger.error(f"读取状态历史失败，使用本进程观察到的禁用频率: {e}")
+        forecast = self.forecaster.update(api_keys)
+        predicted_count = forecast['predicted_active']
+        
         logger.info(f"通道状态统计:")
-        logger.info(f"  - 总通道数: {len(api_channels)}")
-        logger.info(f"  - 活跃通道数: {current_count}")
-        logger.info(f"  - 非活跃通道数: {len(api_channels) - current_count}")
+        logger.info(f"  - 总通道数: {len(api_channels)}（共 {len(api_keys)} 个密钥）")
+        logger.info(f"  - 活跃通道数: {len(active_channels)}，可用密钥数: {current_count}")
+        logger.info(f"  - 不可用密钥数: {len(api_keys) - current_count}")
         logger.info(f"  - 最小需求: {min_channels}")
+        logger.info(f"  - 预测 {forecast['horizon_seconds']} 秒后可用密钥数: {predicted_count} "
+                    f"(额度将耗尽 {forecast['predicted_exhausted']}，预期禁用 {forecast['expected_failures']})")
         
+        need_accounts = 0
+        replenished = False
         if current_count < min_channels:
             need_accounts = (target_channels - current_count + 2) // 3
-            logger.warning(f"活跃通道数不足! 需要补充 {need_accounts} 个账号组")
-            
+            logger.warning(f"可用密钥数不足! 需要补充 {need_accounts} 个账号组")
+        elif predicted_count < min_channels:
+            need_accounts = (target_channels - predicted_count + 2) // 3
+            logger.warning(f"预测可用密钥数将降至 {predicted_count}，提前补充 {need_accounts} 个账号组")
+        
+        if need_accounts > 0:
             if self.mode == "full":
                 # 完整模式：直接上传
                 uploaded_count = self.upload_account_groups(need_accounts)
+                replenished = uploaded_count > 0
                 if uploaded_count > 0:
                     logger.info(f"✅ 本次共上传 {uploaded_count} 个账号组")
                 else:
                     logger.error("❌ 没有可用的账号组进行补充")
             else:
-                # 轻量模式：调用批量上传脚本
-                success = self.call_batch_upload_script(need_accounts)
+                # 轻量模式：进程内批量上传
+                success = self.replenish_with_uploader(need_accounts)
+                replenished = success
                 if success:
                     logger.info("✅ 通道补充完成")
                 else:
                     logger.error("❌ 通道补充失败")
         else:
-            logger.info(f"✅ 通道数量充足 (当前: {current_count} >= 最小需求: {min_channels})")
+            logger.info(f"✅ 可用密钥数量充足 (当前: {current_count} >= 最小需求: {min_channels})")
         
         # 显示活跃通道信息
         if active_channels:
@@ -395,59 +653,226 @@ class GCPAccountManager:
             if len(active_channels) > 5:
                 logger.info(f"  ... 还有 {len(active_channels) - 5} 个活跃通道")
         
+        # 补充和文件移动完成后更新账号组汇总表
+        if self.mode == "full":
+            try:
+                self.sync_account_groups()
+            except Exception as e:
+                logger.error(f"更新账号组汇总表失败: {e}")
+        
         logger.info("本次监控检查完成")
+        
+        etas = [account['eta_seconds'] for account in forecast['accounts'] if account['eta_seconds'] is not None]
+        return {
+            'active': current_count,
+            'predicted': predicted_count,
+            'min_channels': min_channels,
+            'churn': churn,
+            'replenished': replenished,
+            'soonest_eta': min(etas) if etas else None
+        }
     
     def upload_account_groups(self, need_accounts):
-        """上传账号组（完整模式使用）"""
-        uploaded_count = 0
+        """
+        上传账号组（完整模式使用）
+        按 已激活 -> 新账号 的顺序选择完整账号组，最多 upload_concurrency 个组同时上传；
+        某组失败时从候选中补上下一组，直到成功数达到需求或候选用完
+        """
+        started = time.monotonic()
+        uploader = self.get_uploader()
+        # 先处理上次中断遗留的账号组事务
+        uploader.recover_pending_groups()
         
-        # 优先使用已激活的账号
-        activated_groups = self.get_available_account_groups(self.base_dir / "activated")
-        for group_prefix in activated_groups:
-            if uploaded_count >= need_accounts:
-                break
-                
-            if self.upload_account_group(group_prefix, "activated"):
-                uploaded_count += 1
-                logger.info(f"成功上传已激活账号组: {group_prefix}")
-        
-        # 如果还不够，使用新账号
-        fresh_groups = self.get_available_account_groups(self.base_dir / "fresh")
-        for group_prefix in fresh_groups:
-            if uploaded_count >= need_accounts:
-                break
+        # 优先使用已激活的账号，不够时使用新账号
+        candidates = []
+        seen = set()
+        for source_dir in ("activated", "fresh"):
+            scan = scan_directory(self.base_dir / source_dir)
+            if scan is None:
+                continue
+            for prefix, names in scan.complete().items():
+                if prefix not in seen:
+                    seen.add(prefix)
+                    candidates.append((prefix, source_dir, scan.paths(names)))
+        candidates = iter(candidates)
+        
+        concurrency = max(1, self.config['monitoring'].get('upload_concurrency', 4))
+        uploaded_count = 0
+        group_results = []
+        pending = set()
+        # 上传期间持有事务日志的共享锁，其他进程不会把进行中的事务当作遗留事务回滚
+        with uploader.journal.uploading(), ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                while len(pending) < concurrency and uploaded_count + len(pending) < need_accounts:
+                    candidate = next(candidates, None)
+                    if candidate is None:
+                        break
+                    pending.add(executor.submit(self.upload_account_group, *candidate))
+                if not pending:
+                    break
                 
-            if self.upload_account_group(group_prefix, "fresh"):
-                uploaded_count += 1
-                logger.info(f"成功上传新账号组: {group_prefix}")
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    group_result = future.result()
+                    group_results.append(group_result)
+                    if group_result['success']:
+                        uploaded_count += 1
+                        label = "已激活账号组" if group_result['source_dir'] == "activated" else "新账号组"
+                        logger.info(f"成功上传{label}: {group_result['prefix']}（{group_result['seconds']:.2f} 秒）")
+                    else:
+                        logger.error(f"上传账号组失败: {group_result['prefix']}，原因：{group_result['error']}")
         
+        duration = time.monotonic() - started
+        latency = self.group_upload_latency
+        logger.info(
+            f"账号组上传完成: 成功 {uploaded_count}/{len(group_results)} 组，并发 {concurrency}，耗时 {duration:.2f} 秒 | "
+            f"累计单组耗时 P50 {latency.quantile(0.5)}s P95 {latency.quantile(0.95)}s"
+        )
+        self.record_replenish({
+            'mode': 'full',
+            'requested_groups': need_accounts,
+            'uploaded_groups': uploaded_count,
+            'concurrency': concurrency,
+            'groups': group_results,
+            'started_at': time.time() - duration,
+            'duration_seconds': round(duration, 3),
+            'group_latency': latency.snapshot()
+        })
         return uploaded_count
     
-    def upload_account_group(self, account_prefix, source_dir="fresh"):
-        """上传一个账号组的3个JSON文件"""
-        # 这里复用之前的上传逻辑...
-        # 为简化，暂时省略详细实现
-        logger.info(f"模拟上传账号组: {account_prefix} from {source_dir}")
-        return True
+    def get_group_files(self, directory, account_prefix):
+        """账号组在目录中的文件（按序号排序）"""
+        scan = scan_directory(directory)
+        if scan is None:
+            return []
+        return scan.paths(sorted(scan.groups.get(account_prefix, [])))
+    
+    def upload_account_group(self, account_prefix, source_dir="fresh", files=None):
+        """
+        按组事务上传一个账号组的3个JSON文件：渠道全部创建成功才把文件移到uploaded并写库，
+        否则删除已创建的渠道、文件留在原目录；返回本组结果（含耗时和逐文件结果）
+        Args:
+            files: 组内文件（调用方已扫描目录时传入），为None时扫描源目录
+        """
+        started = time.monotonic()
+        group_result = {'prefix': account_prefix, 'source_dir': source_dir, 'success': False, 'files': [], 'error': None}
+        try:
+            uploader = self.get_uploader()
+            if files is None:
+                files = self.get_group_files(self.base_dir / source_dir, account_prefix)
+            if len(files) != 3:
+                raise ValueError(f"{source_dir} 中只有 {len(files)} 个文件")
+            
+            committer = GroupCommitter(uploader, source_dir)
+            results = uploader.upload_group(account_prefix, files, committer, uploader.pack_groups)
+            group_result['files'] = [
+                {'file': Path(file_path).name, 'success': success, 'message': message}
+                for _, file_path, success, message in results
+            ]
+            failed = [message for _, _, success, message in results if not success]
+            if failed:
+                group_result['error'] = failed[0]
+            elif committer.failed_move_files:
+                group_result['error'] = f"文件移动失败: {committer.failed_move_files[0][1]}"
+            else:
+                group_result['success'] = True
+                self.record_group_upload(account_prefix, committer.moved_files)
+        except Exception as e:
+            group_result['error'] = str(e)
+        
+        seconds = time.monotonic() - started
+        group_result['seconds'] = round(seconds, 3)
+        self.group_upload_latency.observe(seconds, error=not group_result['success'])
+        return group_result
+    
+    def record_group_upload(self, account_prefix, moved_files):
+        """在同一事务中写入组内账号的新路径和账号组阶段；失败时由下次对账和汇总纠正"""
+        now = datetime.now()
+        try:
+            conn = self.get_db_connection()
+        except Exception as e:
+            logger.error(f"记录账号组 {account_prefix} 上传结果失败: {e}")
+            return
+        
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO account_status 
+                (account_name, current_status, file_path, last_updated, is_activated)
+                VALUES (%s, 'active', %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                current_status = VALUES(current_status),
+                file_path = VALUES(file_path),
+                last_updated = VALUES(last_updated)
+            ''', [(path.stem, str(path), now, '-actived' in path.stem) for path in moved_files])
+            self.group_table.write_stages(cursor, [(account_prefix, "uploaded", len(moved_files))])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"记录账号组 {account_prefix} 上传结果失败: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def start_watcher(self):
+        """
+        监听账号目录，其他进程把文件移入uploaded（完成补充）时提前唤醒下次检查；
+        完整模式下事件同时更新账号池索引，汇总表只同步事件涉及的组
+        """
+        watcher_config = self.config.get('watcher', {})
+        if not watcher_config.get('enabled', os.getenv('ACCOUNT_WATCHER', 'true').lower() == 'true'):
+            return
+        
+        def on_event(event):
+            if event.target_stage == "uploaded" and event.action in ("created", "moved"):
+                self.scheduler.wake(f"{event.filename} 进入uploaded")
+        
+        watcher = AccountWatcher(
+            self.base_dir,
+            force_polling=watcher_config.get('force_polling', os.getenv('ACCOUNT_WATCHER_POLLING', 'false').lower() == 'true'),
+            poll_interval=watcher_config.get('poll_interval', 5)
+        )
+        if self.pool_index is not None:
+            watcher.subscribe(self.pool_index.apply_event)
+        watcher.subscribe(on_event)
+        if watcher.start():
+            self.watcher = watcher
+            if self.pool_index is not None:
+                self.pool_index.mark_watched()
     
     def run_continuous(self):
-        """持续运行模式"""
+        """持续运行模式：自适应检查间隔，每个周期记录选择的间隔和原因"""
         logger.info("启动持续监控模式")
+        adaptive = self.config['monitoring'].get('adaptive_interval', True)
+        if adaptive:
+            self.start_watcher()
         
         while True:
             try:
-                self.monitor_and_replenish()
+                result = self.monitor_and_replenish()
+                if adaptive:
+                    decision = self.scheduler.after_cycle(result)
+                else:
+                    interval = self.config['monitoring']['check_interval_seconds']
+                    decision = PollDecision(interval, "固定检查间隔")
                 
-                interval = self.config['monitoring']['check_interval_seconds']
-                logger.info(f"等待 {interval} 秒后进行下次检查...")
-                time.sleep(interval)
+                logger.info(f"等待 {decision.interval} 秒后进行下次检查（{decision.reason}）...")
+                self.scheduler.wait(decision)
                 
             except KeyboardInterrupt:
                 logger.info("监控程序已停止")
+                if self.watcher:
+                    self.watcher.stop()
                 break
             except Exception as e:
                 logger.error(f"监控异常: {e}")
-                time.sleep(60)
+                try:
+                    decision = self.scheduler.after_error("监控异常")
+                    logger.info(f"等待 {decision.interval} 秒后重试（{decision.reason}）...")
+                    self.scheduler.wait(decision)
+                except KeyboardInterrupt:
+                    logger.info("监控程序已停止")
+                    break
     
     def run_once(self):
         """单次运行模式"""
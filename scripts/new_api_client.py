@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+New API 客户端
+监控服务、批量上传和Web面板共用：每个进程一个带连接池的Session，
+失败请求按指数退避+随机抖动重试，按接口记录耗时分布；
+分页获取渠道列表，流式增量解析响应，逐个产出渠道
+"""
+
+import bisect
+import codecs
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# 可重试的HTTP状态码
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# 耗时分布的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# 分页获取渠道的最大页数（服务端忽略分页参数、总数异常时防止无限翻页）
+MAX_PAGES = 1000
+
+
+class NewAPIError(Exception):
+    """New API请求或响应异常"""
+
+
+def packed_channel_name(prefix, activated=False):
+    """整组打包上传时的多密钥渠道名称：账号组前缀，已激活的组加 -actived 后缀"""
+    return f"{prefix}-actived" if activated else prefix
+
+
+def expand_channel_keys(channel):
+    """
+    把渠道展开为账号（密钥）级记录，单密钥渠道原样返回
+    多密钥渠道（channel_info.is_multi_key）按密钥顺序展开为 {前缀}-NN[-actived]，
+    密钥状态取 channel_info.multi_key_status_list（未列出的密钥与渠道状态一致，渠道被禁用时全部禁用）；
+    New API只按渠道统计额度，已用额度按密钥数均摊
+    """
+    info = channel.get('channel_info') or {}
+    if not info.get('is_multi_key'):
+        return [channel]
+
+    name = channel.get('name', '')
+    suffix = ''
+    if name.endswith('-actived'):
+        name, suffix = name[:-len('-actived')], '-actived'
+
+    key_count = max(1, int(info.get('multi_key_size') or 3))
+    key_statuses = info.get('multi_key_status_list') or {}
+    channel_status = channel.get('status', 0)
+    used_quota = channel.get('used_quota', 0) // key_count
+
+    keys = []
+    for index in range(key_count):
+        status = channel_status
+        if channel_status == 1:
+            status = key_statuses.get(str(index), key_statuses.get(index, 1))
+        keys.append({
+            'id': channel.get('id'),
+            'name': f"{name}-{index + 1:02d}{suffix}",
+            'status': status,
+            'used_quota': used_quota,
+            'channel_name': channel.get('name', ''),
+            'key_index': index
+        })
+    return keys
+
+
+class LatencyHistogram:
+    """单个接口的耗时分布，线程安全"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """按桶估算分位数，返回所在桶的上界（超出最大桶时返回inf）"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            threshold = q * self.count
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), self.counts):
+                cumulative += count
+                if cumulative >= threshold:
+                    return bound
+            return math.inf
+
+    def snapshot(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (math.inf,), self.counts):
+                cumulative += count
+                buckets['+Inf' if bound == math.inf else str(bound)] = cumulative
+            return {
+                'count': self.count,
+                'sum': round(self.total, 6),
+                'errors': self.errors,
+                'buckets': buckets
+            }
+
+
+class _ItemStreamParser:
+    """
+    增量解析渠道搜索响应 {"success": .., "data": {.., "items": [...], ..}}
+    items数组中的对象在到达时立即产出，其余部分在结束时解析
+    """
+
+    ITEMS_PATTERN = re.compile(r'"items"\s*:\s*\[')
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.head = None
+        self.tail_parts = []
+        self.in_items = False
+
+    def feed(self, text):
+        """输入一段响应文本，返回本段新解析出的渠道"""
+        self.buffer += text
+        items = []
+
+        if self.head is None:
+            match = self.ITEMS_PATTERN.search(self.buffer)
+            if not match:
+                return items
+            self.head = self.buffer[:match.end() - 1]
+            self.buffer = self.buffer[match.end():]
+            self.in_items = True
+
+        if self.in_items:
+            buffer = self.buffer
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                if buffer[pos] == ']':
+                    self.in_items = False
+                    pos += 1
+                    break
+                try:
+                    item, pos = self.decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # 对象尚未接收完整，等待下一段
+                    break
+                items.append(item)
+            self.buffer = buffer[pos:]
+
+        if self.head is not None and not self.in_items:
+            self.tail_parts.append(self.buffer)
+            self.buffer = ''
+
+        return items
+
+    def finish(self):
+        """响应结束，返回(响应外层结构, 未以流式产出的渠道)"""
+        if self.in_items:
+            raise NewAPIError("响应在渠道列表中途结束")
+
+        try:
+            if self.head is None:
+                envelope = json.loads(self.buffer)
+            else:
+                envelope = json.loads(self.head + '[]' + ''.join(self.tail_parts))
+        except json.JSONDecodeError as e:
+            raise NewAPIError(f"响应JSON解析失败: {e}")
+
+        # 旧版本接口直接在data中返回渠道数组
+        data = envelope.get('data') if isinstance(envelope, dict) else None
+        remaining = data if self.head is None and isinstance(data, list) else []
+        return envelope, remaining
+
+
+class NewAPIClient:
+    """New API 客户端"""
+
+    def __init__(self, config):
+        """
+        Args:
+            config: 配置中的 new_api 段
+        """
+        self.base_url = config.get('base_url', '')
+        self.api_key = config.get('api_key', '')
+        self.search_path = config.get('search_path', '/api/channel/search')
+        self.search_params = config.get('search_params', 'keyword=&group=&model=&id_sort=true&tag_mode=false')
+        self.upload_endpoint = config.get('upload_endpoint', '/api/channel/')
+        self.page_size = int(config.get('page_size', 100))
+        self.fetch_concurrency = max(1, int(config.get('fetch_concurrency', 4)))
+        self.timeout = config.get('timeout', 30)
+        self.upload_timeout = config.get('upload_timeout', 15)
+
+        # 重试: 指数退避 + 全抖动
+        self.max_attempts = max(1, int(config.get('retry_attempts', 3)))
+        self.backoff_base = float(config.get('retry_backoff_base', 0.5))
+        self.backoff_max = float(config.get('retry_backoff_max', 8))
+
+        # 认证头只构建一次，挂在Session上
+        self.session = requests.Session()
+        self.session.headers.update({
+            "accept": "application/json, text/plain, */*",
+            "accept-language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "cache-control": "no-store",
+            "new-api-user": "1",
+            "authorization": f"Bearer {self.api_key}",
+            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        })
+        pool_size = int(config.get('pool_size', 10))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.latency = {}
+        self._latency_lock = threading.Lock()
+
+    def _histogram(self, endpoint):
+        with self._latency_lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = LatencyHistogram()
+            return histogram
+
+    @staticmethod
+    def endpoint_label(method, url):
+        """接口标签: 方法 + 去掉主机、查询参数和数字ID的路径"""
+        path = re.sub(r'^https?://[^/]+', '', url).split('?', 1)[0]
+        path = re.sub(r'/\d+(?=/|$)', '/{id}', path)
+        return f"{method} {path}"
+
+    def backoff_delay(self, attempt):
+        """第attempt次失败后的等待时间（全抖动）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    def request(self, method, url, **kwargs):
+        """
+        发送请求，超时、连接失败、429和5xx按指数退避重试
+        重试用尽后返回最后一次的响应，或抛出最后一次的网络异常
+        """
+        if not url.startswith(('http://', 'https://')):
+            url = f"{self.base_url}{url}"
+        kwargs.setdefault('timeout', self.timeout)
+        histogram = self._histogram(self.endpoint_label(method, url))
+
+        for attempt in range(1, self.max_attempts + 1):
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                histogram.observe(time.monotonic() - start, error=True)
+                if attempt >= self.max_attempts:
+                    raise
+                reason = '超时' if isinstance(e, requests.exceptions.Timeout) else f'网络异常 {e}'
+            else:
+                failed = response.status_code in RETRY_STATUS_CODES
+                histogram.observe(time.monotonic() - start, error=failed or response.status_code >= 400)
+                if not failed or attempt >= self.max_attempts:
+                    return response
+                reason = f'状态码{response.status_code}'
+                response.close()
+
+            delay = self.backoff_delay(attempt)
+            logger.warning(f"[重试] {method} {url} 第{attempt}次失败（{reason}），{delay:.2f}秒后重试...")
+            time.sleep(delay)
+
+    def create_channel(self, payload):
+        """创建渠道，失败时抛出NewAPIError"""
+        response = self.request('POST', self.upload_endpoint, json=payload, timeout=self.upload_timeout)
+        return self._check_response(response)
+
+    def _check_response(self, response):
+        """检查响应状态和success字段，返回解析后的JSON"""
+        if response.status_code != 200:
+            raise NewAPIError(f"状态码 {response.status_code}，返回: {response.text}")
+
+        result = response.json()
+        # 有些API成功时不返回success字段
+        if not result.get('success', True):
+            raise NewAPIError(f"API返回失败: {result.get('message', '未知错误')}")
+        return result
+
+    def find_channel_ids(self, name):
+        """按名称精确查找渠道ID（创建渠道的接口不返回ID，回滚时用名称查找）"""
+        params = dict(parse_qsl(self.search_params, keep_blank_values=True))
+        params.update({'keyword': name, 'p': 1, 'page_size': self.page_size})
+        result = self._check_response(self.request('GET', self.search_path, params=params))
+
+        data = result.get('data') or {}
+        items = data.get('items', []) if isinstance(data, dict) else data
+        return [item['id'] for item in items if item.get('name') == name and 'id' in item]
+
+    def delete_channel(self, channel_id):
+        """删除渠道，失败时抛出NewAPIError"""
+        return self._check_response(self.request('DELETE', f"{self.upload_endpoint.rstrip('/')}/{channel_id}"))
+
+    def record_latency(self, method, url, seconds, error=False):
+        """记录一次请求耗时（供不经过request()的调用方使用，如异步上传）"""
+        self._histogram(self.endpoint_label(method, url)).observe(seconds, error=error)
+
+    def latency_snapshot(self):
+        """各接口耗时分布快照"""
+        with self._latency_lock:
+            histograms = dict(self.latency)
+        return {endpoint: histogram.snapshot() for endpoint, histogram in histograms.items()}
+
+    def latency_summary(self):
+        """各接口耗时的单行摘要，用于日志"""
+        with self._latency_lock:
+            histograms = dict(self.latency)
+        return "; ".join(
+            f"{endpoint}: {h.count}次, 平均 {h.total / h.count * 1000:.0f}ms, "
+            f"p50≤{h.quantile(0.5)}s, p95≤{h.quantile(0.95)}s, 失败 {h.errors}"
+            for endpoint, h in sorted(histograms.items()) if h.count
+        )
+
+    def search_url(self, page):
+        """构建渠道搜索分页URL"""
+        separator = '&' if self.search_params else ''
+        return f"{self.base_url}{self.search_path}?{self.search_params}{separator}p={page}&page_size={self.page_size}"
+
+    def _stream_page(self, page):
+        """
+        流式获取一页渠道，逐个产出渠道；生成器结束时返回响应外层结构
+        """
+        url = self.search_url(page)
+        logger.info(f"查询API URL: {url}")
+
+        with self.request('GET', url, stream=True) as response:
+            if response.status_code != 200:
+                raise NewAPIError(f"HTTP {response.status_code}: {response.text[:500]}")
+
+            parser = _ItemStreamParser()
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            for chunk in response.iter_content(chunk_size=65536):
+                yield from parser.feed(decoder.decode(chunk))
+            yield from parser.feed(decoder.decode(b'', final=True))
+
+            envelope, remaining = parser.finish()
+            if not envelope.get('success', False):
+                raise NewAPIError(f"API返回失败: {envelope.get('message', '未知错误')}")
+            yield from remaining
+            return envelope
+
+    def _fetch_page(self, page):
+        """获取一整页渠道（供并发分页使用）"""
+        return list(self._stream_page(page))
+
+    def iter_channels(self):
+        """
+        分页获取全部渠道，以生成器逐个产出
+        第一页流式产出；得知总数后其余页按 fetch_concurrency 并发获取，按页序产出
+        """
+        seen_ids = set()
+
+        def unique(items):
+            for item in items:
+                channel_id = item.get('id')
+                if channel_id is not None:
+                    if channel_id in seen_ids:
+                        continue
+                    seen_ids.add(channel_id)
+                yield item
+
+        first_page = self._stream_page(1)
+        first_count = 0
+        while True:
+            try:
+                item = next(first_page)
+            except StopIteration as stop:
+                envelope = stop.value or {}
+                break
+            first_count += 1
+            yield from unique([item])
+
+        data = envelope.get('data')
+        total = data.get('total') if isinstance(data, dict) else None
+
+        # 服务端未分页（返回条数超过页大小）或第一页未满，说明已经取完
+        if first_count != self.page_size:
+            return
+
+        if total is not None:
+            page_count = math.ceil(total / self.page_size)
+            if page_count > MAX_PAGES:
+                logger.warning(f"渠道总数 {total} 超过 {MAX_PAGES} 页，只获取前 {MAX_PAGES} 页")
+                page_count = MAX_PAGES
+            pages = range(2, page_count + 1)
+            if not pages:
+                return
+            with ThreadPoolExecutor(max_workers=min(self.fetch_concurrency, len(pages))) as executor:
+                for items in executor.map(self._fetch_page, pages):
+                    yield from unique(items)
+            return
+
+        # 没有总数时顺序翻页，直到某页不满；服务端忽略分页参数（整页都是已获取的渠道）或达到页数上限时停止
+        for page in range(2, MAX_PAGES + 1):
+            items = self._fetch_page(page)
+            new_items = list(unique(items))
+            yield from new_items
+            if len(items) < self.page_size:
+                return
+            if not new_items:
+                logger.warning(f"第 {page} 页没有新的渠道，服务端可能忽略了分页参数，停止翻页")
+                return
+        logger.warning(f"渠道列表超过 {MAX_PAGES} 页，停止翻页")
+
+    def get_channels(self):
+        """获取全部渠道列表"""
+        return list(self.iter_channels())
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def get_shared_client(config):
+    """获取进程内共享的客户端（同一服务地址和令牌共用一个连接池）"""
+    key = (config.get('base_url', ''), config.get('api_key', ''))
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = _shared_clients[key] = NewAPIClient(config)
+        return client
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控自适应检查间隔
+可用数接近下限或状态频繁变化时快速检查，稳定时逐步退避；补充之后很快复查一次；
+异常时指数退避。等待期间可被外部事件（如 uploaded 目录有新文件）提前唤醒，
+短时间内的多个事件合并为一次检查。
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PollDecision:
+    """一次检查间隔的决定"""
+
+    __slots__ = ('interval', 'reason', 'decided_at', 'woken_by')
+
+    def __init__(self, interval, reason):
+        self.interval = interval
+        self.reason = reason
+        self.decided_at = time.time()
+        self.woken_by = None  # 被提前唤醒时的原因
+
+    def to_dict(self):
+        return {
+            'interval': self.interval,
+            'reason': self.reason,
+            'decided_at': self.decided_at,
+            'woken_by': self.woken_by
+        }
+
+
+class AdaptivePollScheduler:
+    """自适应检查间隔调度器"""
+
+    def __init__(self, base_interval, min_interval=30, max_interval=1800, replenish_delay=30,
+                 near_margin=3, backoff_factor=1.5, settle_seconds=5):
+        """
+        Args:
+            base_interval: 常规检查间隔（即 check_interval_seconds）
+            min_interval: 低于/接近下限或异常退避的起始间隔
+            max_interval: 稳定时退避的上限
+            replenish_delay: 补充之后复查的间隔
+            near_margin: 可用数不超过 下限+near_margin 时视为接近下限
+            backoff_factor: 稳定时每个周期间隔放大的倍数
+            settle_seconds: 被唤醒后等待合并后续事件的时间
+        """
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.replenish_delay = replenish_delay
+        self.near_margin = near_margin
+        self.backoff_factor = backoff_factor
+        self.settle_seconds = settle_seconds
+
+        self.current_interval = base_interval
+        self.error_streak = 0
+        self.history = deque(maxlen=100)
+        self._wake_event = threading.Event()
+        self._wake_reason = None
+        self._lock = threading.Lock()
+
+    def _decide(self, interval, reason):
+        decision = PollDecision(round(interval), reason)
+        self.history.append(decision)
+        return decision
+
+    def after_cycle(self, result):
+        """
+        根据本周期的检查结果决定下次检查间隔
+        Args:
+            result: monitor_and_replenish 返回的摘要，为None表示获取渠道失败
+        """
+        if result is None:
+            return self.after_error("获取渠道数据失败")
+
+        self.error_streak = 0
+        active = result['active']
+        predicted = result['predicted']
+        min_channels = result['min_channels']
+
+        if result['replenished']:
+            self.current_interval = self.base_interval
+            return self._decide(self.replenish_delay, "刚完成补充，尽快复查")
+
+        if active < min_channels or predicted < min_channels:
+            self.current_interval = self.min_interval
+            return self._decide(self.min_interval, f"可用 {active}/预测 {predicted} 低于下限 {min_channels}")
+
+        if active <= min_channels + self.near_margin:
+            self.current_interval = self.min_interval
+            return self._decide(self.min_interval, f"可用 {active} 接近下限 {min_channels}")
+
+        # 不晚于最早预测的额度耗尽时间的一半再检查
+        eta_cap = self.max_interval
+        if result.get('soonest_eta') is not None:
+            eta_cap = max(self.min_interval, result['soonest_eta'] / 2)
+
+        if result['churn']:
+            # 状态变化时回到不超过常规间隔的一半
+            self.current_interval = max(self.min_interval, min(self.current_interval, self.base_interval, eta_cap) / 2)
+            return self._decide(self.current_interval, f"{result['churn']} 个密钥状态变化")
+
+        self.current_interval = min(self.max_interval, max(self.current_interval, self.min_interval) * self.backoff_factor)
+        if self.current_interval > eta_cap:
+            self.current_interval = eta_cap
+            return self._decide(eta_cap, f"状态稳定，但最早 {round(result['soonest_eta'])} 秒后有账号额度耗尽")
+        return self._decide(self.current_interval, "状态稳定，逐步退避")
+
+    def after_error(self, reason):
+        """异常后指数退避"""
+        self.error_streak += 1
+        interval = min(self.max_interval, self.min_interval * 2 ** (self.error_streak - 1))
+        return self._decide(interval, f"{reason}，第 {self.error_streak} 次连续失败")
+
+    def wake(self, reason):
+        """提前唤醒等待中的调度（可在其他线程调用）"""
+        with self._lock:
+            if self._wake_reason is None:
+                self._wake_reason = reason
+        self._wake_event.set()
+
+    def wait(self, decision):
+        """
+        按决定的间隔等待，被唤醒时再等待 settle_seconds 合并后续事件
+        等待开始前的唤醒视为本周期自身操作产生的事件，直接丢弃
+        """
+        with self._lock:
+            self._wake_reason = None
+        self._wake_event.clear()
+
+        if self._wake_event.wait(decision.interval):
+            with self._lock:
+                decision.woken_by = self._wake_reason
+            logger.info(f"检查被提前唤醒: {decision.woken_by}，{self.settle_seconds} 秒后检查")
+            time.sleep(self.settle_seconds)
+            # 合并等待期间的后续事件
+            self._wake_event.clear()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号池内存索引
+目录 -> 账号组前缀 -> AccountFile，启动时构建一次，
+之后只在目录修改时间变化时重新扫描该目录，面板自身的文件移动增量更新。
+同时记录成员发生变化的账号组前缀（drain_changed），供汇总表只更新变化的组。
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from scripts.account_scanner import GROUP_SIZE, POOL_DIRECTORIES, parse_group_prefix, scan_directory
+from scripts.models import AccountFile, AccountGroup
+
+
+class _DirectoryState:
+    """单个目录的索引状态"""
+
+    __slots__ = ('path', 'mtime_ns', 'files', 'groups')
+
+    def __init__(self, path, mtime_ns):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.files = {}   # 文件名 -> AccountFile
+        self.groups = {}  # 前缀 -> 文件名集合
+
+    def add(self, filename, size, mtime):
+        """添加或更新文件，返回账号组前缀（不符合命名规范时为None）"""
+        self.files[filename] = AccountFile(filename, str(self.path / filename), size, mtime)
+        prefix = parse_group_prefix(filename[:-len('.json')])
+        if prefix is not None:
+            self.groups.setdefault(prefix, set()).add(filename)
+        return prefix
+
+    def remove(self, filename):
+        """移除文件，返回账号组前缀（文件不在索引中时为None）"""
+        if self.files.pop(filename, None) is None:
+            return None
+        prefix = parse_group_prefix(filename[:-len('.json')])
+        members = self.groups.get(prefix)
+        if members is not None:
+            members.discard(filename)
+            if not members:
+                del self.groups[prefix]
+        return prefix
+
+
+class _PendingChange:
+    """记录一次批量变更中面板自身完成的文件操作"""
+
+    def __init__(self):
+        self.operations = []
+
+    def added(self, directory, filename):
+        self.operations.append(('add', directory, filename))
+
+    def removed(self, directory, filename):
+        self.operations.append(('remove', directory, filename))
+
+    def moved(self, source_dir, source_name, target_dir, target_name):
+        self.removed(source_dir, source_name)
+        self.added(target_dir, target_name)
+
+
+class AccountPoolIndex:
+    """账号池内存索引，线程安全"""
+
+    def __init__(self, base_dir, directories=None):
+        self.base_dir = Path(base_dir)
+        self.directories = list(directories or POOL_DIRECTORIES)
+        self._lock = threading.RLock()
+        self._states = {}
+        self._watched = False
+        # 自上次 drain_changed 以来成员发生变化的账号组前缀
+        self._changed = set()
+
+        for directory in self.directories:
+            self._rescan(directory)
+
+    def _dir_mtime(self, directory):
+        """获取目录修改时间，目录不存在时返回None"""
+        try:
+            return os.stat(self.base_dir / directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _rescan(self, directory):
+        """完整扫描一个目录"""
+        # 先取目录时间再扫描，扫描期间若有变化，下次访问会再次扫描
+        dir_path = self.base_dir / directory
+        state = _DirectoryState(dir_path, self._dir_mtime(directory))
+        scan = scan_directory(dir_path, with_stat=True)
+        if scan is not None:
+            state.files = {
+                name: AccountFile(name, str(dir_path / name), size, mtime)
+                for name, (size, mtime) in scan.files.items()
+            }
+            state.groups = {prefix: set(names) for prefix, names in scan.groups.items()}
+
+        previous = self._states.get(directory)
+        if previous is not None:
+            # 没有事件的修改（监听未启用或其他进程），按扫描前后的差异记录变化的组
+            self._changed.update(
+                prefix for prefix in previous.groups.keys() | state.groups.keys()
+                if previous.groups.get(prefix) != state.groups.get(prefix)
+            )
+
+        self._states[directory] = state
+        return state
+
+    def _get_state(self, directory):
+        """获取目录索引，目录修改时间变化时重新扫描"""
+        state = self._states.get(directory)
+        if state is None or state.mtime_ns != self._dir_mtime(directory):
+            state = self._rescan(directory)
+        return state
+
+    def get_groups(self, directory):
+        """获取目录中的完整账号组(3个文件)：前缀 -> AccountGroup，序列化格式与原目录扫描结果一致"""
+        with self._lock:
+            state = self._get_state(directory)
+            return {
+                prefix: AccountGroup(prefix, directory, [state.files[filename] for filename in sorted(members)])
+                for prefix, members in state.groups.items()
+                if len(members) == GROUP_SIZE
+            }
+
+    def count_groups(self, directory):
+        """统计目录中完整账号组数量"""
+        with self._lock:
+            state = self._get_state(directory)
+            return sum(1 for members in state.groups.values() if len(members) == GROUP_SIZE)
+
+    def stage_counts(self, prefixes=None):
+        """账号组在各目录中的文件数：前缀 -> {目录: 文件数}，prefixes为None时返回所有组"""
+        counts = {}
+        with self._lock:
+            for directory in self.directories:
+                state = self._get_state(directory)
+                if prefixes is None:
+                    items = state.groups.items()
+                else:
+                    items = ((prefix, state.groups[prefix]) for prefix in prefixes if prefix in state.groups)
+                for prefix, members in items:
+                    counts.setdefault(prefix, {})[directory] = len(members)
+        return counts
+
+    @contextmanager
+    def changing(self, *directories):
+        """
+        面板自身移动/写入文件时使用，结束后增量更新索引
+        用法:
+            with index.changing("exhausted_300", "activated") as change:
+                shutil.move(...)
+                change.moved("exhausted_300", old_name, "activated", new_name)
+        """
+        with self._lock:
+            before = {directory: self._dir_mtime(directory) for directory in directories}
+            change = _PendingChange()
+            try:
+                yield change
+            finally:
+                self._apply(change.operations)
+
+                for directory in directories:
+                    state = self._states.get(directory)
+                    # 只有变更前索引是最新的，才能直接采用新的目录时间；
+                    # 否则期间可能有其他进程的修改，留待下次访问时重新扫描
+                    if state is not None and state.mtime_ns == before[directory]:
+                        state.mtime_ns = self._dir_mtime(directory)
+
+    def _apply(self, operations):
+        """把文件操作应用到索引"""
+        for action, directory, filename in operations:
+            state = self._states.get(directory)
+            if state is None:
+                continue
+
+            if action == 'remove':
+                prefix = state.remove(filename)
+            else:
+                try:
+                    stat = os.stat(self.base_dir / directory / filename)
+                except FileNotFoundError:
+                    prefix = state.remove(filename)
+                else:
+                    prefix = state.add(filename, stat.st_size, stat.st_mtime)
+            if prefix is not None:
+                self._changed.add(prefix)
+
+    def apply_event(self, event):
+        """应用目录监听器(AccountWatcher)产生的生命周期事件"""
+        operations = []
+        if event.source_stage is not None:
+            operations.append(('remove', event.source_stage, event.source_name))
+        if event.target_stage is not None:
+            operations.append(('add', event.target_stage, event.filename))
+
+        with self._lock:
+            self._apply(operations)
+
+            if not self._watched:
+                return
+
+            # 监听器启动后，任何并发修改都会产生自己的事件，可以直接采用新的目录时间
+            for directory in {event.source_stage, event.target_stage} - {None}:
+                state = self._states.get(directory)
+                if state is not None:
+                    state.mtime_ns = self._dir_mtime(directory)
+
+    def refresh(self):
+        """按修改时间刷新所有目录（只对修改过的目录重新扫描）"""
+        with self._lock:
+            for directory in self.directories:
+                self._get_state(directory)
+
+    def drain_changed(self):
+        """取出自上次调用以来成员发生变化的账号组前缀（先按修改时间刷新）"""
+        with self._lock:
+            self.refresh()
+            changed, self._changed = self._changed, set()
+            return changed
+
+    def mark_watched(self):
+        """
+        监听器启动后调用：监听启动前的修改没有事件，先按修改时间补一次刷新，
+        之后事件可以直接推进目录时间
+        """
+        with self._lock:
+            self.refresh()
+            self._watched = True
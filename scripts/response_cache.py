@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+面板接口响应缓存（Redis）
+每个接口独立TTL；过期后的一段时间内（stale）直接返回旧数据并在后台刷新，
+请求不需要等待New API；同一时刻只有一个进程/线程在重新计算（SET NX 锁），
+其余未命中的请求等待其结果。redis_client为None或Redis异常时直接计算，不影响接口。
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+from redis.exceptions import RedisError
+
+from scripts import fast_json
+
+logger = logging.getLogger(__name__)
+
+# 只有持有者才能释放锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class ResponseCache:
+    """带stale-while-revalidate和单飞锁的Redis响应缓存"""
+
+    def __init__(self, redis_client, ttls, stale_seconds=300, namespace="gcp_panel:cache",
+                 lock_timeout=30, wait_timeout=10, available=None, on_error=None):
+        """
+        Args:
+            redis_client: redis.Redis实例（decode_responses=True），为None时不缓存
+            available: 返回Redis当前是否可用的函数，不可用时直接计算（不等待连接超时）
+            on_error: Redis操作失败时的回调，参数为异常
+            ttls: 缓存名 -> 新鲜期（秒）
+            stale_seconds: 过期后仍可返回旧数据并后台刷新的时长
+            lock_timeout: 重新计算锁的超时，防止计算进程崩溃后锁不释放
+            wait_timeout: 未命中时等待其他进程计算结果的最长时间
+        """
+        self.redis = redis_client
+        self.ttls = ttls
+        self.stale_seconds = stale_seconds
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.available = available or (lambda: True)
+        self.on_error = on_error or (lambda error: None)
+        self._release_lock = redis_client.register_script(_RELEASE_LOCK_SCRIPT) if redis_client else None
+
+    def _key(self, name):
+        return f"{self.namespace}:{name}"
+
+    def _read(self, name):
+        """读取缓存条目；条目损坏（无法解析或缺少字段）时删除并按未命中处理"""
+        raw = self.redis.get(self._key(name))
+        if not raw:
+            return None
+        try:
+            entry = fast_json.loads(raw)
+            return {'data': entry['data'], 'stored_at': float(entry['stored_at'])}
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"缓存条目损坏 {name}，删除后重新计算: {e}")
+            self.redis.delete(self._key(name))
+            return None
+
+    def _acquire(self, name):
+        """尝试获取重新计算锁，成功时返回锁令牌"""
+        token = uuid.uuid4().hex
+        if self.redis.set(f"{self._key(name)}:lock", token, nx=True, ex=self.lock_timeout):
+            return token
+        return None
+
+    def _generation(self, name):
+        return self.redis.get(f"{self._key(name)}:gen")
+
+    def _compute_and_store(self, name, compute, should_cache, token):
+        """计算并写入缓存，最后释放锁；计算期间缓存被清除时不写入（结果可能基于清除前的状态）"""
+        try:
+            generation = self._generation(name)
+            data = compute()
+            if should_cache(data) and self._generation(name) == generation:
+                entry = fast_json.dumps({'data': data, 'stored_at': time.time()}, default=str)
+                try:
+                    self.redis.set(self._key(name), entry, ex=self.ttls[name] + self.stale_seconds)
+                except Exception as e:
+                    logger.warning(f"写入缓存失败 {name}: {e}")
+            return data
+        finally:
+            try:
+                self._release_lock(keys=[f"{self._key(name)}:lock"], args=[token])
+            except Exception as e:
+                logger.warning(f"释放缓存锁失败 {name}: {e}")
+
+    def _refresh_in_background(self, name, compute, should_cache):
+        token = self._acquire(name)
+        if token is None:
+            # 其他进程正在刷新
+            return
+
+        def refresh():
+            try:
+                self._compute_and_store(name, compute, should_cache, token)
+            except Exception as e:
+                logger.error(f"后台刷新缓存失败 {name}: {e}")
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{name}", daemon=True).start()
+
+    def get(self, name, compute, should_cache=lambda data: data is not None):
+        """
+        获取缓存的数据，返回 (数据, 缓存状态)
+        缓存状态: hit 新鲜命中 / stale 返回旧数据并后台刷新 / miss 重新计算 / bypass 未启用缓存
+        """
+        if self.redis is None or not self.available():
+            return compute(), 'bypass'
+
+        try:
+            entry = self._read(name)
+            if entry is not None and time.time() - entry['stored_at'] < self.ttls[name]:
+                return entry['data'], 'hit'
+            if entry is not None:
+                self._refresh_in_background(name, compute, should_cache)
+                return entry['data'], 'stale'
+            token = self._acquire(name)
+        except RedisError as e:
+            # 只有Redis本身的错误才标记为不可用
+            logger.warning(f"读取缓存失败 {name}，直接计算: {e}")
+            self.on_error(e)
+            return compute(), 'bypass'
+
+        if token is not None:
+            return self._compute_and_store(name, compute, should_cache, token), 'miss'
+
+        # 其他请求正在计算，等待其结果；超时后自己计算
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            try:
+                entry = self._read(name)
+            except Exception:
+                break
+            if entry is not None:
+                return entry['data'], 'hit'
+
+        return compute(), 'miss'
+
+    def invalidate(self, *names):
+        """删除指定缓存，下次请求重新计算"""
+        if self.redis is None or not names or not self.available():
+            return
+        try:
+            pipe = self.redis.pipeline()
+            for name in names:
+                pipe.incr(f"{self._key(name)}:gen")
+                pipe.delete(self._key(name))
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"清除缓存失败 {names}: {e}")
+            self.on_error(e)
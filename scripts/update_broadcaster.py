@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+面板数据变化推送（Server-Sent Events）
+每个进程一个后台线程定期（或被账号目录事件提前唤醒）计算各主题的数据，
+只有数据变化时才推送给订阅的页面：新连接先收到完整数据，之后只收到变化的部分。
+计算成本只与检查频率有关，与打开的页面数量无关；没有订阅者时线程空闲。
+"""
+
+import logging
+import queue
+import threading
+
+from scripts import fast_json
+
+logger = logging.getLogger(__name__)
+
+
+def _diff(old, new, key):
+    """
+    计算两份数据的差异，返回 (changed, removed)；无法增量时返回None
+    dict 按顶层键比较；list 在指定 key 时按元素的该字段比较
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {k: v for k, v in new.items() if old.get(k) != v}
+        removed = [k for k in old if k not in new]
+        return changed, removed
+
+    if key and isinstance(old, list) and isinstance(new, list):
+        old_items = {item.get(key): item for item in old}
+        new_keys = set()
+        changed = []
+        for item in new:
+            new_keys.add(item.get(key))
+            if old_items.get(item.get(key)) != item:
+                changed.append(item)
+        removed = [k for k in old_items if k not in new_keys]
+        return changed, removed
+
+    return None
+
+
+class UpdateBroadcaster:
+    """按主题检测数据变化并推送给所有订阅者"""
+
+    def __init__(self, check_interval=5, heartbeat_seconds=15, max_queue=50):
+        """
+        Args:
+            check_interval: 有订阅者时检查数据变化的间隔（秒）
+            heartbeat_seconds: 无推送时发送心跳注释的间隔，防止代理断开空闲连接
+            max_queue: 每个订阅者积压的最大消息数，超过时断开（页面会自动重连并重新获取完整数据）
+        """
+        self.check_interval = check_interval
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_queue = max_queue
+
+        self.topics = {}     # 主题 -> (计算函数, 列表元素的键字段)
+        self.latest = {}     # 主题 -> (版本号, 数据)
+        self.subscribers = {}  # 队列 -> 订阅的主题集合
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+
+    def register(self, topic, compute, key=None):
+        """注册主题；compute 返回可JSON序列化的数据，返回None时跳过本次检查"""
+        self.topics[topic] = (compute, key)
+
+    def notify(self, event=None):
+        """提前检查数据变化（可作为目录监听的订阅回调，也在面板操作后调用）"""
+        self._wake_event.set()
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="update-broadcaster", daemon=True)
+                self._thread.start()
+
+    def subscribe(self, topics):
+        """订阅主题，返回消息队列；已有数据的主题立即放入完整数据"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self.subscribers[subscriber] = set(topics)
+            for topic in topics:
+                if topic in self.latest:
+                    version, data = self.latest[topic]
+                    subscriber.put_nowait(self._format(topic, version, {'full': True, 'data': data}))
+        self._ensure_thread()
+        self._wake_event.set()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.pop(subscriber, None)
+
+    @staticmethod
+    def _format(topic, version, body):
+        body['version'] = version
+        payload = fast_json.dumps(body, default=str)
+        return f"event: {topic}\nid: {version}\ndata: {payload}\n\n"
+
+    def _broadcast(self, topic, message):
+        with self._lock:
+            targets = [(subscriber, topics) for subscriber, topics in self.subscribers.items()]
+        for subscriber, topics in targets:
+            if topic not in topics:
+                continue
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # 消费过慢的连接：放入结束标记，由 stream 关闭连接
+                logger.warning("推送连接积压过多，断开连接")
+                self.unsubscribe(subscriber)
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(None)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def check_topic(self, topic):
+        """计算一个主题的最新数据，有变化时推送增量"""
+        compute, key = self.topics[topic]
+        try:
+            data = compute()
+        except Exception as e:
+            logger.error(f"计算推送数据失败 {topic}: {e}")
+            return
+        if data is None:
+            return
+
+        # 经过一次序列化，和上次推送的数据按同样的形式比较
+        data = fast_json.loads(fast_json.dumps(data, default=str))
+
+        with self._lock:
+            previous = self.latest.get(topic)
+            if previous is not None and previous[1] == data:
+                return
+            version = previous[0] + 1 if previous else 1
+            self.latest[topic] = (version, data)
+
+        delta = _diff(previous[1], data, key) if previous else None
+        if delta is None:
+            message = self._format(topic, version, {'full': True, 'data': data})
+        else:
+            changed, removed = delta
+            message = self._format(topic, version, {'full': False, 'changed': changed, 'removed': removed})
+        self._broadcast(topic, message)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                active_topics = set()
+                for topics in self.subscribers.values():
+                    active_topics |= topics
+
+            for topic in active_topics:
+                if topic in self.topics:
+                    self.check_topic(topic)
+
+            if not active_topics:
+                # 没有订阅者：丢弃旧数据，等待新的订阅
+                with self._lock:
+                    self.latest.clear()
+            self._wake_event.wait(self.check_interval if active_topics else None)
+            self._wake_event.clear()
+
+    def stream(self, topics):
+        """SSE响应生成器；连接断开时（GeneratorExit）取消订阅"""
+        subscriber = self.subscribe(topics)
+        try:
+            yield f"retry: {int(self.check_interval * 1000)}\n\n"
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.heartbeat_seconds)
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号组上传事务日志
+每个进行中的账号组一个JSON文件（原子替换写入），记录事务状态和已创建的渠道，
+进程崩溃后下次启动时据此补完文件移动或回滚已创建的渠道。
+
+多个进程（监控服务、命令行上传）共用同一个日志目录：上传期间持有目录锁文件的共享锁，
+恢复时需要获得排他锁，有其他进程正在上传时跳过恢复，不会回滚进行中的事务。
+
+状态:
+    uploading       正在创建渠道
+    committed       渠道已全部创建，文件尚未全部移动
+    rollback_failed 回滚未完成，下次启动时重试
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class UploadJournal:
+    """账号组上传事务日志"""
+
+    def __init__(self, journal_dir="logs/upload_journal"):
+        self.journal_dir = Path(journal_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        
+        # 进程间协调：flock 作用于打开的文件，每个实例单独打开一次
+        self._lock_file = open(self.journal_dir / ".lock", 'a')
+        # 本实例进行中的上传数，第一个开始时加共享锁，最后一个结束时释放
+        self._flock_mutex = threading.Lock()
+        self._uploading = 0
+
+    @contextmanager
+    def uploading(self):
+        """上传期间持有共享锁（可重入，多个线程、多个进程可以同时上传），恢复在此期间等待"""
+        with self._flock_mutex:
+            if self._uploading == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+            self._uploading += 1
+        try:
+            yield
+        finally:
+            with self._flock_mutex:
+                self._uploading -= 1
+                if self._uploading == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def recovering(self):
+        """
+        尝试获得排他锁，产出是否获得：
+        没有任何进程（包括本实例的其他线程）正在上传时才能恢复遗留的事务
+        """
+        with self._flock_mutex:
+            if self._uploading:
+                yield False
+                return
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _path(self, prefix):
+        return self.journal_dir / f"{prefix}.json"
+
+    def _write(self, entry):
+        """原子写入：先写临时文件并落盘，再替换"""
+        path = self._path(entry['prefix'])
+        tmp_path = path.with_suffix('.tmp')
+        entry['updated_at'] = datetime.now().isoformat()
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _read(self, prefix):
+        with open(self._path(prefix), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def begin(self, prefix, source_dir, files):
+        """开始一个账号组事务"""
+        with self._lock:
+            self._write({
+                'prefix': prefix,
+                'state': 'uploading',
+                'source_dir': source_dir,
+                'files': [f.name for f in files],
+                'created_channels': [],
+                'started_at': datetime.now().isoformat()
+            })
+
+    def record_created(self, prefix, channel_name):
+        """记录一个已创建的渠道"""
+        with self._lock:
+            entry = self._read(prefix)
+            entry['created_channels'].append(channel_name)
+            self._write(entry)
+
+    def set_state(self, prefix, state):
+        with self._lock:
+            entry = self._read(prefix)
+            entry['state'] = state
+            self._write(entry)
+
+    def finish(self, prefix):
+        """事务结束（已提交并移动完文件，或已回滚），删除日志"""
+        with self._lock:
+            try:
+                self._path(prefix).unlink()
+            except FileNotFoundError:
+                pass
+
+    def pending(self):
+        """列出未结束的事务"""
+        entries = []
+        for path in sorted(self.journal_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries.append(json.load(f))
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"无法读取上传事务日志 {path.name}: {e}")
+        return entries
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web面板的生产环境WSGI入口
+    gunicorn -c docker/gunicorn.conf.py wsgi:app
+每个worker导入本模块时各自创建PanelManager（数据库连接池、Redis连接在首次使用时建立）
+"""
+
+from app import app
+
+__all__ = ['app']